@@ -20,9 +20,10 @@ while True:
             print("7: Update realm data (fetch and load into DuckDB)")
             print("8: Create/Update Test Database (creates or updates a database with a smaller subset of data for testing purposes)")
             print("9: View database with DuckDB UI")
+            print("10: Retry failed fetches (items, item_details, item_media and auction realms)")
             print("0: Exit")
 
-            choice = input("Please enter your choice (0-9): ")
+            choice = input("Please enter your choice (0-10): ")
 
             match choice:
                 case "1":
@@ -35,8 +36,18 @@ while True:
                     print("Updating commodities data...")
                     run_pipeline(test_mode=False, sources=["commodities"], scheema="raw_auctions")
                 case "4":
-                    print("Updating Item data...")
-                    run_pipeline(test_mode=False, sources=["items"], scheema="raw_items")
+                    print("1: Fetch new items only")
+                    print("2: Full sync (re-verify every item)")
+                    sync_choice = input("Please enter your choice (1-2): ")
+                    match sync_choice:
+                        case "1":
+                            print("Updating Item data...")
+                            run_pipeline(test_mode=False, sources=["items"], scheema="raw_items")
+                        case "2":
+                            print("Running full item sync...")
+                            run_pipeline(test_mode=False, sources=["items"], scheema="raw_items", full_item_sync=True)
+                        case _:
+                            print("Invalid choice. Please try again.")
                 case "5":
                     print("Updating media data for items...")
                     run_pipeline(test_mode=False, sources=["item_media"], scheema="raw_items")
@@ -69,6 +80,10 @@ while True:
                         print("Error: 'duckdb' command not found. Please ensure DuckDB CLI is installed and in your system's PATH.")
                     except subprocess.CalledProcessError as e:
                         print(f"Error launching DuckDB UI: {e}. Check DuckDB installation and permissions.")
+                case "10":
+                    print("Retrying failed fetches...")
+                    run_pipeline(test_mode=False, sources=["items", "item_details", "item_media"], scheema="raw_items", retry_failed=True)
+                    run_pipeline(test_mode=False, sources=["auctions"], scheema="raw_auctions", retry_failed=True)
                 case "0":
                     print("Exiting the program. Farewell, adventurer!")
                     sys.exit(0)
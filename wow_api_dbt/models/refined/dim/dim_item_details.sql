@@ -1,6 +1,6 @@
 SELECT
     idet.id,
-    idet.name__en_us AS name,
+    coalesce(i.name__en_us, idet.name__en_us) AS name, -- Kept current by the item search, the details are only refetched when the preview changes
     idet.description__en_us AS description,
     idet.preview_item__requirements__skill__profession__name__en_us AS profession_requirement,
     idet.preview_item__requirements__skill__profession__id AS profession_requirement_id,
@@ -39,4 +39,6 @@ SELECT
     istat.value AS value
 FROM {{ source('raw_items', 'item_details') }} AS idet
 
+LEFT JOIN {{ source('raw_items', 'items') }} AS i ON i.id = idet.id
+
 LEFT JOIN {{ source('raw_items', 'item_details__preview_item__stats') }} AS istat ON istat._dlt_parent_id = idet._dlt_id
\ No newline at end of file
@@ -0,0 +1,45 @@
+-- models/refined/fct/fct_auction_new_listings.sql
+
+-- Auctions that were listed between two consecutive snapshots of a realm.
+-- Incremental: a run only diffs the snapshots that arrived since the last run. The history is filtered
+-- on snapshot_id first, so only those snapshots and their predecessors are read and hash joined on the auction id.
+{{ config(materialized='incremental', incremental_strategy='append') }}
+
+WITH pairs AS (
+    SELECT *
+    FROM {{ ref('fct_auction_snapshot_pairs') }}
+    WHERE previous_snapshot_id IS NOT NULL
+    {% if is_incremental() %}
+        AND snapshot_id > (SELECT coalesce(max(snapshot_id), 0) FROM {{ this }})
+    {% endif %}
+),
+
+current_auctions AS (
+    SELECT snapshot_id, id, item__id, bid, buyout, quantity, time_left
+    FROM {{ source('raw_auctions', 'auction_history') }}
+    WHERE snapshot_id IN (SELECT snapshot_id FROM pairs)
+),
+
+previous_auctions AS (
+    SELECT snapshot_id, id
+    FROM {{ source('raw_auctions', 'auction_history') }}
+    WHERE snapshot_id IN (SELECT previous_snapshot_id FROM pairs)
+)
+
+SELECT
+    p.snapshot_id,
+    p.realm_group_id,
+    c.id AS auction_id,
+    c.item__id AS item_id,
+    c.bid,
+    c.buyout,
+    c.quantity,
+    c.time_left,
+    p.last_modified AS first_seen_at
+FROM pairs AS p
+JOIN current_auctions AS c
+    ON c.snapshot_id = p.snapshot_id
+LEFT JOIN previous_auctions AS pa
+    ON pa.snapshot_id = p.previous_snapshot_id
+    AND pa.id = c.id
+WHERE pa.id IS NULL
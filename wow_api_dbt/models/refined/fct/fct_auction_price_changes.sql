@@ -0,0 +1,47 @@
+-- models/refined/fct/fct_auction_price_changes.sql
+
+-- Auctions present in two consecutive snapshots of a realm whose bid or buyout changed (e.g. after being outbid).
+-- Incremental the same way as fct_auction_new_listings.
+{{ config(materialized='incremental', incremental_strategy='append') }}
+
+WITH pairs AS (
+    SELECT *
+    FROM {{ ref('fct_auction_snapshot_pairs') }}
+    WHERE previous_snapshot_id IS NOT NULL
+    {% if is_incremental() %}
+        AND snapshot_id > (SELECT coalesce(max(snapshot_id), 0) FROM {{ this }})
+    {% endif %}
+),
+
+current_auctions AS (
+    SELECT snapshot_id, id, item__id, bid, buyout, quantity
+    FROM {{ source('raw_auctions', 'auction_history') }}
+    WHERE snapshot_id IN (SELECT snapshot_id FROM pairs)
+),
+
+previous_auctions AS (
+    SELECT snapshot_id, id, bid, buyout, quantity
+    FROM {{ source('raw_auctions', 'auction_history') }}
+    WHERE snapshot_id IN (SELECT previous_snapshot_id FROM pairs)
+)
+
+SELECT
+    p.snapshot_id,
+    p.realm_group_id,
+    c.id AS auction_id,
+    c.item__id AS item_id,
+    pa.bid AS previous_bid,
+    c.bid,
+    pa.buyout AS previous_buyout,
+    c.buyout,
+    pa.quantity AS previous_quantity,
+    c.quantity,
+    p.last_modified AS changed_by
+FROM pairs AS p
+JOIN current_auctions AS c
+    ON c.snapshot_id = p.snapshot_id
+JOIN previous_auctions AS pa
+    ON pa.snapshot_id = p.previous_snapshot_id
+    AND pa.id = c.id
+WHERE c.bid IS DISTINCT FROM pa.bid
+    OR c.buyout IS DISTINCT FROM pa.buyout
@@ -0,0 +1,54 @@
+-- models/refined/fct/fct_auction_removed_listings.sql
+
+-- Auctions that disappeared between two consecutive snapshots of a realm, with a guess whether they sold or expired.
+-- The API only reports a time_left bucket (SHORT < 30 min, MEDIUM < 2 h, LONG < 12 h, VERY_LONG < 48 h).
+-- An auction counts as expired when the longest time it could have had left has passed between the snapshots,
+-- otherwise it ended early and counts as sold (cancelled auctions look the same and are counted as sold too).
+-- Incremental the same way as fct_auction_new_listings.
+{{ config(materialized='incremental', incremental_strategy='append') }}
+
+WITH pairs AS (
+    SELECT *
+    FROM {{ ref('fct_auction_snapshot_pairs') }}
+    WHERE previous_snapshot_id IS NOT NULL
+    {% if is_incremental() %}
+        AND snapshot_id > (SELECT coalesce(max(snapshot_id), 0) FROM {{ this }})
+    {% endif %}
+),
+
+current_auctions AS (
+    SELECT snapshot_id, id
+    FROM {{ source('raw_auctions', 'auction_history') }}
+    WHERE snapshot_id IN (SELECT snapshot_id FROM pairs)
+),
+
+previous_auctions AS (
+    SELECT snapshot_id, id, item__id, bid, buyout, quantity, time_left
+    FROM {{ source('raw_auctions', 'auction_history') }}
+    WHERE snapshot_id IN (SELECT previous_snapshot_id FROM pairs)
+)
+
+SELECT
+    p.snapshot_id,
+    p.realm_group_id,
+    pa.id AS auction_id,
+    pa.item__id AS item_id,
+    pa.bid,
+    pa.buyout,
+    pa.quantity,
+    pa.time_left AS last_time_left,
+    p.previous_last_modified AS last_seen_at,
+    p.last_modified AS removed_by,
+    CASE
+        WHEN date_diff('minute', p.previous_last_modified, p.last_modified)
+            >= CASE pa.time_left WHEN 'SHORT' THEN 30 WHEN 'MEDIUM' THEN 120 WHEN 'LONG' THEN 720 ELSE 2880 END
+        THEN 'expired'
+        ELSE 'sold'
+    END AS outcome
+FROM pairs AS p
+JOIN previous_auctions AS pa
+    ON pa.snapshot_id = p.previous_snapshot_id
+LEFT JOIN current_auctions AS c
+    ON c.snapshot_id = p.snapshot_id
+    AND c.id = pa.id
+WHERE c.id IS NULL
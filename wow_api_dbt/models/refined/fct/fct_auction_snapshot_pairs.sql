@@ -0,0 +1,14 @@
+-- models/refined/fct/fct_auction_snapshot_pairs.sql
+
+-- Every complete auction snapshot next to the previous complete snapshot of the same connected realm.
+-- The auction diff models compare the two to find new, removed and repriced auctions.
+-- auction_snapshots has one row per realm and snapshot, so this stays small however long the history gets.
+SELECT
+    snapshot_id,
+    realm_id AS realm_group_id,
+    snapshot_hour,
+    last_modified,
+    LAG(snapshot_id) OVER realm_snapshots AS previous_snapshot_id,
+    LAG(last_modified) OVER realm_snapshots AS previous_last_modified
+FROM {{ source('raw_auctions', 'auction_snapshots') }}
+WINDOW realm_snapshots AS (PARTITION BY realm_id ORDER BY snapshot_id)
@@ -0,0 +1,35 @@
+-- models/refined/fct/fct_commodity_prices.sql
+
+-- Commodity prices per item and snapshot over the whole history.
+-- Recent snapshots are aggregated from the raw commodities, older ones were already folded into commodity_aggregates.
+WITH recent AS (
+    SELECT
+        timestamp,
+        item__id,
+        count(*) AS auction_count,
+        sum(quantity) AS quantity,
+        min(unit_price) AS min_unit_price,
+        max(unit_price) AS max_unit_price,
+        sum(unit_price * quantity) / nullif(sum(quantity), 0) AS avg_unit_price
+    FROM {{ source('raw_auctions', 'commodities') }}
+    GROUP BY timestamp, item__id
+),
+
+compacted AS (
+    SELECT timestamp, item__id, auction_count, quantity, min_unit_price, max_unit_price, avg_unit_price
+    FROM {{ source('raw_auctions', 'commodity_aggregates') }}
+)
+
+SELECT
+    timestamp AS snapshot_time,
+    item__id AS item_id,
+    auction_count,
+    quantity,
+    min_unit_price,
+    max_unit_price,
+    avg_unit_price
+FROM (
+    SELECT * FROM recent
+    UNION ALL
+    SELECT * FROM compacted
+)
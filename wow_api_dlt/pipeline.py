@@ -1,12 +1,13 @@
 import dlt
 
 from .resources.source import wow_api_source
+from .utilities.commodity_compaction import compact_commodities
 import os
 
 DB_PATH = os.path.abspath("wow_api_dbt/wow_api_data.duckdb")
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-def run_pipeline(sources = None, test_mode=False,scheema="raw"):
+def run_pipeline(sources = None, test_mode=False,scheema="raw",full_item_sync=False,retry_failed=False):
     pipeline = dlt.pipeline(
     pipeline_name = "wow_api_data",  # The name of the pipeline for test mode
     destination = dlt.destinations.duckdb(str(DB_PATH)),  # The destination where the data will be loaded
@@ -15,11 +16,13 @@ def run_pipeline(sources = None, test_mode=False,scheema="raw"):
     )
     if sources is not None:
         # If a specific source list is provided, we use it to run only those resources
-        load_info = pipeline.run(wow_api_source(optional_source_list=sources,test_mode=test_mode))
+        load_info = pipeline.run(wow_api_source(optional_source_list=sources,test_mode=test_mode,full_item_sync=full_item_sync,retry_failed=retry_failed))
     else:
-        load_info = pipeline.run(wow_api_source(test_mode=test_mode))
+        load_info = pipeline.run(wow_api_source(test_mode=test_mode,full_item_sync=full_item_sync))
     if load_info:    
         print(load_info)
+    if sources is None or "commodities" in sources:
+        compact_commodities(pipeline) # Fold old commodity snapshots into per-item aggregates
     
 if __name__ == "__main__":
     run_pipeline()
\ No newline at end of file
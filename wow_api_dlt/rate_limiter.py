@@ -1,8 +1,85 @@
+import asyncio
 import time
 import threading
 import sys
+from abc import ABC, abstractmethod
+from collections import deque
+from pathlib import Path
+
+from .utilities.sqlite_util import LazySQLiteConnection
+
+# Minimum number of seconds between two status lines written to the console
+STATUS_REPORT_INTERVAL_SECONDS = 5.0
+
+class _ReservingRateLimiter(ABC):
+    """
+    Shared behaviour for limiters that hand out reservations.
+
+    Subclasses implement `reserve()`, which books the tokens immediately and returns how long
+    the caller has to wait before using them. The actual waiting happens outside any lock,
+    with time.sleep (threads) or asyncio.sleep (coroutines).
+    """
+
+    last_status_report = 0.0
+    quota_store = None # Optional SQLiteQuotaStore shared with other processes on this host
+
+    @abstractmethod
+    def reserve(self, num_tokens=1):
+        """Books num_tokens and returns how many seconds the caller has to wait before using them."""
+
+    @abstractmethod
+    def _status_line(self):
+        """One line describing the limiter's current usage, for the console status report."""
+
+    def observe_response(self, status_code, headers, latency_seconds):
+        """Feedback hook called by the fetch engine after every response. Static limiters ignore it."""
+        return
+
+    def _maybe_report_status(self):
+        """Writes a status line at most once every STATUS_REPORT_INTERVAL_SECONDS, outside the lock."""
+        now = time.monotonic()
+        if now - self.last_status_report < STATUS_REPORT_INTERVAL_SECONDS:
+            return
+        self.last_status_report = now
+        sys.stdout.write(f"\r{self._status_line()}     ")
+        sys.stdout.flush()
+
+    def _shared_wait(self, num_tokens, time_to_wait):
+        """Books the same tokens in the host-wide quota store, no earlier than the local slot."""
+        now_epoch = time.time()
+        shared_slot = self.quota_store.reserve(num_tokens, not_before=now_epoch + time_to_wait)
+        return max(time_to_wait, shared_slot - now_epoch)
+
+    def wait_for_token(self, num_tokens=1):
+        """Blocking acquisition for threads."""
+        time_to_wait = self.reserve(num_tokens)
+        if self.quota_store is not None:
+            time_to_wait = self._shared_wait(num_tokens, time_to_wait)
+        self._maybe_report_status()
+        if time_to_wait > 0:
+            time.sleep(time_to_wait)
+
+    async def wait_for_token_async(self, num_tokens=1):
+        """Non-blocking acquisition for coroutines running on an event loop."""
+        time_to_wait = self.reserve(num_tokens)
+        if self.quota_store is not None:
+            # SQLite may wait on another process's write lock, so keep it off the event loop
+            time_to_wait = await asyncio.to_thread(self._shared_wait, num_tokens, time_to_wait)
+        self._maybe_report_status()
+        if time_to_wait > 0:
+            await asyncio.sleep(time_to_wait)
+
+
+class TokenBucket(_ReservingRateLimiter):
+    """
+    Token bucket that hands out reservations instead of sleeping while holding its lock.
+
+    `reserve()` takes the tokens immediately and returns how long the caller has to wait
+    before it may use them. The balance is allowed to go negative: a negative balance is
+    simply a queue of callers that already own future time slots. The lock is only held
+    for a few arithmetic operations, so callers never line up behind a sleeping thread.
+    """
 
-class TokenBucket:
     def __init__(self, capacity, refill_rate_per_second):
         if capacity <= 0 or refill_rate_per_second <= 0:
             raise ValueError("Capacity and refill rate must be positive.")
@@ -10,127 +87,399 @@ class TokenBucket:
         self.capacity = capacity
         self.refill_rate_per_second = refill_rate_per_second
         self.tokens = capacity  # Start with a full bucket
-        self.last_refill_time = time.time()
+        self.last_refill_time = time.monotonic()
         self.lock = threading.Lock() # Essential for thread safety
 
-    def _refill_tokens(self):
-        now = time.time()
+        # Counters for the throttled status line, updated under the lock
+        self.tokens_acquired = 0
+        self.throttled_acquisitions = 0
+
+    def _refill_tokens(self, now):
         time_elapsed = now - self.last_refill_time
         refill_amount = time_elapsed * self.refill_rate_per_second
         self.tokens = min(self.capacity, self.tokens + refill_amount)
         self.last_refill_time = now
 
-    def wait_for_token(self, num_tokens=1):
+    def reserve(self, num_tokens=1):
+        """
+        Reserves num_tokens and returns the number of seconds the caller must wait before using them.
+        Never blocks beyond the short critical section.
+        """
         if num_tokens <= 0:
+            return 0.0
+        if num_tokens > self.capacity:
+            raise ValueError("Cannot reserve more tokens than the bucket capacity.")
+
+        with self.lock:
+            now = time.monotonic()
+            self._refill_tokens(now)
+            self.tokens -= num_tokens
+            self.tokens_acquired += num_tokens
+            if self.tokens >= 0:
+                return 0.0
+            self.throttled_acquisitions += 1
+            # Time until the refill has paid back our share of the deficit
+            return -self.tokens / self.refill_rate_per_second
+
+    def _status_line(self):
+        return (
+            f"Tokens available: {self.tokens:.2f}/{self.capacity} (Rate: {self.refill_rate_per_second} req/s, "
+            f"acquired: {self.tokens_acquired}, throttled: {self.throttled_acquisitions})"
+        )
+
+
+# --- Rolling-window quota accounting ---
+
+class SlidingWindowRateLimiter(_ReservingRateLimiter):
+    """
+    Rolling-window quota accountant for an API with a per-second and a per-hour limit.
+
+    The limiter remembers the time slot of every reserved request that is still inside
+    one of the windows. A new request gets the earliest slot where neither the last
+    second nor the last hour would exceed its limit, so traffic is only throttled when
+    a window is actually full instead of pausing on a fixed schedule.
+    """
+
+    SECOND_WINDOW_SECONDS = 1.0
+    HOUR_WINDOW_SECONDS = 3600.0
+
+    def __init__(self, per_second_limit, per_hour_limit, quota_store=None):
+        if per_second_limit <= 0 or per_hour_limit <= 0:
+            raise ValueError("per_second_limit and per_hour_limit must be positive.")
+
+        self.per_second_limit = per_second_limit
+        self.per_hour_limit = per_hour_limit
+        # Only the most recent `limit` slots can constrain the next one, so the windows are capped at that length
+        self.second_window = deque(maxlen=per_second_limit)
+        self.hour_window = deque(maxlen=per_hour_limit)
+        self.last_slot = 0.0
+        self.lock = threading.Lock()
+        self.quota_store = quota_store
+
+        self.tokens_acquired = 0
+        self.throttled_acquisitions = 0
+
+    def _next_slot(self, now):
+        """Earliest slot that keeps both windows within their limits. Must be called under the lock."""
+        # Slots are handed out in order, which keeps both windows sorted
+        slot = max(now, self.last_slot)
+        if len(self.second_window) == self.per_second_limit:
+            slot = max(slot, self.second_window[0] + self.SECOND_WINDOW_SECONDS)
+        if len(self.hour_window) == self.per_hour_limit:
+            slot = max(slot, self.hour_window[0] + self.HOUR_WINDOW_SECONDS)
+        return slot
+
+    def reserve(self, num_tokens=1):
+        """
+        Reserves num_tokens request slots and returns the number of seconds until the last one starts.
+        Never blocks beyond the short critical section.
+        """
+        if num_tokens <= 0:
+            return 0.0
+
+        with self.lock:
+            now = time.monotonic()
+            # Slots that left the hour window can no longer constrain anything
+            while self.hour_window and self.hour_window[0] <= now - self.HOUR_WINDOW_SECONDS:
+                self.hour_window.popleft()
+
+            for _ in range(num_tokens):
+                slot = self._next_slot(now)
+                self.second_window.append(slot)
+                self.hour_window.append(slot)
+                self.last_slot = slot
+
+            self.tokens_acquired += num_tokens
+            if slot <= now:
+                return 0.0
+            self.throttled_acquisitions += 1
+            return slot - now
+
+    def _status_line(self):
+        return (
+            f"Requests in the last hour: {len(self.hour_window)}/{self.per_hour_limit} "
+            f"(Limit: {self.per_second_limit} req/s, acquired: {self.tokens_acquired}, throttled: {self.throttled_acquisitions})"
+        )
+
+
+# --- Host-wide quota shared between processes ---
+
+class SQLiteQuotaStore:
+    """
+    API quota shared by every process on this host that opens the same SQLite file.
+
+    Reservations are counted in one-second and one-minute buckets. A request gets the first
+    slot (no earlier than `not_before`) whose second bucket is below the per-second limit and
+    where the last 61 minute buckets, which always cover a full rolling hour, are below the
+    per-hour limit. Each reservation is one short write transaction, so a Dagster run and a
+    main.py run draw from the same budget instead of each assuming they own all of it.
+    """
+
+    def __init__(self, db_path, per_second_limit, per_hour_limit):
+        if per_second_limit <= 0 or per_hour_limit <= 0:
+            raise ValueError("per_second_limit and per_hour_limit must be positive.")
+
+        self.db_path = str(db_path)
+        self.per_second_limit = per_second_limit
+        self.per_hour_limit = per_hour_limit
+        self.lock = threading.Lock() # One connection per process, shared by its threads
+        # Transactions are opened explicitly, so the connection runs in autocommit mode
+        self._db = LazySQLiteConnection(self.db_path, self._create_tables, isolation_level=None)
+        self._last_cleanup_minute = None
+
+    @staticmethod
+    def _create_tables(conn):
+        conn.execute("CREATE TABLE IF NOT EXISTS second_usage (second INTEGER PRIMARY KEY, requests INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS minute_usage (minute INTEGER PRIMARY KEY, requests INTEGER NOT NULL)")
+
+    def _find_slot(self, conn, slot):
+        """Earliest slot at or after `slot` with room in both windows. Runs inside the write transaction."""
+        while True:
+            second = int(slot)
+            row = conn.execute("SELECT requests FROM second_usage WHERE second = ?", (second,)).fetchone()
+            if row is not None and row[0] >= self.per_second_limit:
+                slot = second + 1.0
+                continue
+
+            minute = int(slot // 60)
+            used_this_hour = conn.execute(
+                "SELECT COALESCE(SUM(requests), 0) FROM minute_usage WHERE minute BETWEEN ? AND ?",
+                (minute - 60, minute),
+            ).fetchone()[0]
+            if used_this_hour >= self.per_hour_limit:
+                # Wait until the oldest busy minute in the window has aged out of it
+                oldest_minute = conn.execute(
+                    "SELECT MIN(minute) FROM minute_usage WHERE minute BETWEEN ? AND ? AND requests > 0",
+                    (minute - 60, minute),
+                ).fetchone()[0]
+                slot = (oldest_minute + 61) * 60.0
+                continue
+            return slot
+
+    def reserve(self, num_tokens=1, not_before=None):
+        """Reserves num_tokens request slots and returns the epoch time at which the last one may be sent."""
+        with self.lock:
+            conn = self._db.connection()
+            now = time.time()
+            slot = max(now, not_before or now)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for _ in range(num_tokens):
+                    slot = self._find_slot(conn, slot)
+                    conn.execute(
+                        "INSERT INTO second_usage VALUES (?, 1) ON CONFLICT(second) DO UPDATE SET requests = requests + 1",
+                        (int(slot),),
+                    )
+                    conn.execute(
+                        "INSERT INTO minute_usage VALUES (?, 1) ON CONFLICT(minute) DO UPDATE SET requests = requests + 1",
+                        (int(slot // 60),),
+                    )
+                # Drop buckets that can no longer constrain anything, once a minute is enough
+                current_minute = int(now // 60)
+                if current_minute != self._last_cleanup_minute:
+                    conn.execute("DELETE FROM second_usage WHERE second < ?", (int(now) - 1,))
+                    conn.execute("DELETE FROM minute_usage WHERE minute < ?", (current_minute - 61,))
+                    self._last_cleanup_minute = current_minute
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return slot
+
+
+# --- Adaptive rate control ---
+
+def _parse_header_seconds(value, now_epoch):
+    """Parses a Retry-After / X-RateLimit-Reset value into seconds from now. Accepts delays and epoch timestamps."""
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        return None
+    if seconds > 1_000_000_000: # Looks like an epoch timestamp rather than a delay
+        seconds -= now_epoch
+    return max(0.0, seconds)
+
+
+class AdaptiveRateLimiter(SlidingWindowRateLimiter):
+    """
+    Sliding-window limiter whose request pace is driven by the API responses it sees.
+
+    Requests are spaced at `rate_per_second`, which is tuned AIMD-style: every successful
+    response adds a little to the rate (about `additive_increase` req/s per second of traffic),
+    and a 429 multiplies it by `multiplicative_decrease`. Retry-After and remaining-quota
+    headers pause or cap the pace directly, and growth is held while latency is well above
+    the best latency seen, which is usually the first sign of server-side throttling.
+    The sliding windows still enforce the hard per-second and per-hour limits on top.
+    """
+
+    def __init__(self, per_second_limit, per_hour_limit, initial_rate_per_second=None, min_rate_per_second=1.0,
+                 additive_increase=5.0, multiplicative_decrease=0.5, decrease_cooldown_seconds=1.0, latency_tolerance=2.0,
+                 quota_store=None):
+        super().__init__(per_second_limit, per_hour_limit, quota_store=quota_store)
+        if not 0 < multiplicative_decrease < 1:
+            raise ValueError("multiplicative_decrease must be between 0 and 1.")
+        if min_rate_per_second <= 0 or min_rate_per_second > per_second_limit:
+            raise ValueError("min_rate_per_second must be positive and not above per_second_limit.")
+
+        self.max_rate_per_second = per_second_limit
+        self.min_rate_per_second = min_rate_per_second
+        self.rate_per_second = min(per_second_limit, initial_rate_per_second or per_second_limit)
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.decrease_cooldown_seconds = decrease_cooldown_seconds
+        self.latency_tolerance = latency_tolerance
+
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.baseline_latency = None
+        self.smoothed_latency = None
+        self.rate_limited_responses = 0
+
+    def _next_slot(self, now):
+        slot = super()._next_slot(now)
+        # Honour any Retry-After / quota reset pause, then space requests at the current rate
+        return max(slot, self.paused_until, self.last_slot + 1.0 / self.rate_per_second)
+
+    def _decrease_rate(self, now):
+        # Responses to requests that were already in flight when the first 429 arrived belong to the
+        # same congestion event, so the rate is only cut once per cooldown
+        if now - self.last_decrease < self.decrease_cooldown_seconds:
             return
+        self.rate_per_second = max(self.min_rate_per_second, self.rate_per_second * self.multiplicative_decrease)
+        self.last_decrease = now
+
+    def _update_latency(self, latency_seconds):
+        """Tracks smoothed and baseline latency, returns True when latency suggests the API is congested."""
+        if latency_seconds is None or latency_seconds <= 0:
+            return False
+        if self.smoothed_latency is None:
+            self.smoothed_latency = self.baseline_latency = latency_seconds
+            return False
+        self.smoothed_latency = 0.8 * self.smoothed_latency + 0.2 * latency_seconds
+        # The baseline creeps upwards slowly, so a permanent shift in latency does not freeze the rate forever
+        self.baseline_latency = min(latency_seconds, self.baseline_latency * 1.001)
+        return self.smoothed_latency > self.latency_tolerance * self.baseline_latency
 
+    def observe_response(self, status_code, headers, latency_seconds):
+        now = time.monotonic()
+        now_epoch = time.time()
         with self.lock:
-            self._refill_tokens()
-            
-            # Check if there are enough tokens AFTER refill
-            if self.tokens >= num_tokens:
-                self.tokens -= num_tokens
-                # Print calls left in bucket
-                # Using sys.stdout.write for in-place update in console applications
-                sys.stdout.write(f"\rTokens available: {self.tokens:.2f}/{self.capacity} (Rate: {self.refill_rate_per_second} req/s)     ")
-                sys.stdout.flush()
+            congested = self._update_latency(latency_seconds)
+
+            if status_code == 429:
+                self.rate_limited_responses += 1
+                retry_after = _parse_header_seconds(headers.get("Retry-After"), now_epoch)
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+                self._decrease_rate(now)
                 return
-            
-            # If not enough tokens, calculate how long to wait
-            tokens_needed = num_tokens - self.tokens
-            time_to_wait = tokens_needed / self.refill_rate_per_second
-            
-            # Print the waiting message (on a new line to avoid overwriting progress bars)
-            sys.stdout.write(f"\nRate limit hit! Waiting for {time_to_wait:.2f} seconds to acquire {num_tokens} token(s). Current tokens: {self.tokens:.2f}/{self.capacity}\n")
-            sys.stdout.flush()
-
-            # Reset last refill time *before* sleeping to accurately account for sleep duration
-            self.last_refill_time = time.time() 
-            time.sleep(time_to_wait)
-            
-            # After waiting, refill again and attempt to acquire tokens
-            self._refill_tokens()
-            self.tokens -= num_tokens # This should now succeed or indicate a logic error
-            
-            # Print calls left after waiting and acquiring
-            sys.stdout.write(f"\rTokens available: {self.tokens:.2f}/{self.capacity} (Rate: {self.refill_rate_per_second} req/s)     ")
-            sys.stdout.flush()
-
-
-# --- New logic for the hourly break ---
-
-class HourlyBreakRateLimiter:
-    def __init__(self, token_bucket: TokenBucket, break_duration_minutes: int = 10, break_interval_hours: int = 1):
-        if not isinstance(token_bucket, TokenBucket):
-            raise TypeError("token_bucket must be an instance of TokenBucket.")
-        if not isinstance(break_duration_minutes, (int, float)) or break_duration_minutes <= 0:
-            raise ValueError("break_duration_minutes must be a positive number.")
-        if not isinstance(break_interval_hours, (int, float)) or break_interval_hours <= 0:
-            raise ValueError("break_interval_hours must be a positive number.")
-
-        self.token_bucket = token_bucket
-        self.break_duration_seconds = break_duration_minutes * 60
-        self.break_interval_seconds = break_interval_hours * 3600 # 1 hour = 3600 seconds
-        self.last_break_time = time.time() # Initialize to now
-        self.break_lock = threading.Lock() # To prevent multiple threads from initiating a break
-
-    def _check_and_apply_break(self):
-        now = time.time()
-        time_since_last_break = now - self.last_break_time
-
-        if time_since_last_break >= self.break_interval_seconds:
-            with self.break_lock:
-                # Double-check inside the lock, as another thread might have just taken the break
-                if now - self.last_break_time >= self.break_interval_seconds:
-                    sys.stdout.write(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())}] Hourly break initiated! Pausing for {self.break_duration_seconds / 60:.0f} minutes.\n")
-                    sys.stdout.flush()
-                    time.sleep(self.break_duration_seconds)
-                    self.last_break_time = time.time() # Update last break time after the break
-                    sys.stdout.write(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())}] Hourly break finished. Resuming operations.\n")
-                    sys.stdout.flush()
-
-    def wait_for_token_with_break(self, num_tokens=1):
-        self._check_and_apply_break() # Check for and apply break before waiting for token
-        self.token_bucket.wait_for_token(num_tokens)
-
-
-# Initialize a global/shared rate limiter instance (original configuration)
-# Target: 36,000 requests/hour = 600 requests/minute = 10 requests/second
-# Let's set a capacity that allows for some burst, e.g., 600 requests (1 minute's worth)
-API_CAPACITY = 550
-API_REFILL_RATE_PER_SECOND = 8 
-
-# IMPORTANT: These global instances are now directly used by client.py
-# So, they are defined here for consistency and clarity.
-_blizzard_token_bucket_instance = TokenBucket(capacity=API_CAPACITY, refill_rate_per_second=API_REFILL_RATE_PER_SECOND)
-blizzard_api_rate_limiter = HourlyBreakRateLimiter(
-    _blizzard_token_bucket_instance, 
-    break_duration_minutes=10, 
-    break_interval_hours=1
+
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset_seconds = _parse_header_seconds(headers.get("X-RateLimit-Reset"), now_epoch)
+            if remaining is not None and reset_seconds:
+                try:
+                    remaining = float(remaining)
+                except ValueError:
+                    remaining = None
+                if remaining is not None and remaining <= 0:
+                    self.paused_until = max(self.paused_until, now + reset_seconds)
+                    return
+                if remaining is not None and remaining / reset_seconds < self.rate_per_second:
+                    # Spread what is left of the quota evenly over the rest of its window
+                    self.rate_per_second = max(self.min_rate_per_second, remaining / reset_seconds)
+                    return
+
+            if status_code < 500 and not congested:
+                self.rate_per_second = min(self.max_rate_per_second, self.rate_per_second + self.additive_increase / self.rate_per_second)
+
+    def _status_line(self):
+        return (
+            f"Requests in the last hour: {len(self.hour_window)}/{self.per_hour_limit} "
+            f"(Rate: {self.rate_per_second:.1f}/{self.max_rate_per_second} req/s, acquired: {self.tokens_acquired}, "
+            f"throttled: {self.throttled_acquisitions}, 429s: {self.rate_limited_responses})"
+        )
+
+
+# Initialize a global/shared rate limiter instance
+# Blizzard allows 36,000 requests/hour and 100 requests/second per client.
+# These are ceilings: the actual pace starts lower and is tuned from the API responses.
+# We stay slightly below both so clock skew between us and the API never trips a 429.
+API_REQUESTS_PER_SECOND = 90
+API_REQUESTS_PER_HOUR = 35_000
+API_INITIAL_REQUESTS_PER_SECOND = 45
+
+# Every process on this host (Dagster runs, main.py runs) books its requests in this file,
+# so overlapping runs share one budget. It lives next to the DuckDB database.
+API_QUOTA_DB_PATH = Path(__file__).resolve().parents[1] / "wow_api_dbt" / "api_quota.sqlite"
+
+# IMPORTANT: This global instance is used by the fetch engine in utilities/auth_util.py
+# So, it is defined here for consistency and clarity.
+blizzard_api_rate_limiter = AdaptiveRateLimiter(
+    per_second_limit=API_REQUESTS_PER_SECOND,
+    per_hour_limit=API_REQUESTS_PER_HOUR,
+    initial_rate_per_second=API_INITIAL_REQUESTS_PER_SECOND,
+    quota_store=SQLiteQuotaStore(API_QUOTA_DB_PATH, per_second_limit=API_REQUESTS_PER_SECOND, per_hour_limit=API_REQUESTS_PER_HOUR),
 )
 
-# Example usage (for testing this file directly, if needed)
+
+# --- Microbenchmark ---
+
+def _benchmark_threads(bucket, callers, acquisitions_per_caller):
+    """Acquires tokens from `callers` threads at once and returns acquisitions/sec."""
+    start_barrier = threading.Barrier(callers + 1)
+
+    def worker():
+        start_barrier.wait()
+        for _ in range(acquisitions_per_caller):
+            bucket.wait_for_token()
+
+    threads = [threading.Thread(target=worker) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return callers * acquisitions_per_caller / (time.perf_counter() - start_time)
+
+
+def _benchmark_asyncio(bucket, callers, acquisitions_per_caller):
+    """Acquires tokens from `callers` coroutines on one event loop and returns acquisitions/sec."""
+    async def worker():
+        for _ in range(acquisitions_per_caller):
+            await bucket.wait_for_token_async()
+
+    async def run_all():
+        start_time = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(callers)))
+        return time.perf_counter() - start_time
+
+    return callers * acquisitions_per_caller / asyncio.run(run_all())
+
+
+# Run the microbenchmark with: python -m wow_api_dlt.rate_limiter
 if __name__ == "__main__":
-    print("Testing rate_limiter.py directly with hourly break...")
-    # This test simulates calls and demonstrates the hourly break
-    # It will take over an hour to see the break if break_interval_hours is 1.
-    # For quick testing, you can adjust break_interval_hours to a smaller value (e.g., 1/60 for 1 minute).
-    
-    # Let's make it easy to test the break immediately by setting interval to 1 minute
-    test_limiter = HourlyBreakRateLimiter(
-        TokenBucket(capacity=10, refill_rate_per_second=1), # Small bucket for quick hits
-        break_duration_minutes=0.1, # 6 seconds break for testing
-        break_interval_hours=1/60 # Every 1 minute for testing
-    )
-
-    start_time = time.time()
-    for i in range(200): # Simulate many API calls
-        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())}] Attempting API call {i+1}...")
-        test_limiter.wait_for_token_with_break()
-        # Simulate some work or actual API call here
-        time.sleep(0.5) # Simulate time between calls, adjust as needed
-
-        if i % 20 == 0:
-            sys.stdout.write("\n") # Newline every 20 calls for readability
-
-    print(f"\nSimulated API calls finished after {time.time() - start_time:.2f} seconds.")
\ No newline at end of file
+    CALLERS = 64
+    STATUS_REPORT_INTERVAL_SECONDS = float("inf") # Keep console output out of the measurement
+
+    print(f"Rate limiter microbenchmark with {CALLERS} concurrent callers")
+
+    # 1. Bucket never runs dry: measures the raw cost of an acquisition under contention
+    unlimited = TokenBucket(capacity=10_000_000, refill_rate_per_second=10_000_000)
+    print(f"  threads, unthrottled: {_benchmark_threads(unlimited, CALLERS, 2_000):>12,.0f} acquisitions/sec")
+    unlimited = TokenBucket(capacity=10_000_000, refill_rate_per_second=10_000_000)
+    print(f"  asyncio, unthrottled: {_benchmark_asyncio(unlimited, CALLERS, 2_000):>12,.0f} acquisitions/sec")
+
+    window = SlidingWindowRateLimiter(per_second_limit=10_000_000, per_hour_limit=10_000_000)
+    print(f"  threads, sliding window, unthrottled: {_benchmark_threads(window, CALLERS, 2_000):>12,.0f} acquisitions/sec")
+
+    # 2. Bucket runs dry: callers sleep on their reserved slots, throughput should match the refill rate
+    RATE = 2_000
+    throttled = TokenBucket(capacity=100, refill_rate_per_second=RATE)
+    print(f"  threads, throttled at {RATE}/s: {_benchmark_threads(throttled, CALLERS, 50):>8,.0f} acquisitions/sec")
+    throttled = TokenBucket(capacity=100, refill_rate_per_second=RATE)
+    print(f"  asyncio, throttled at {RATE}/s: {_benchmark_asyncio(throttled, CALLERS, 50):>8,.0f} acquisitions/sec")
+    window = SlidingWindowRateLimiter(per_second_limit=RATE, per_hour_limit=10_000_000)
+    print(f"  threads, sliding window at {RATE}/s: {_benchmark_threads(window, CALLERS, 50):>8,.0f} acquisitions/sec")
@@ -1,75 +1,347 @@
 import dlt
-from wow_api_dlt.utilities.dlt_util import fetch_realm_ids, _update_progress_bar
+from wow_api_dlt.utilities.dlt_util import fetch_realm_ids, _update_progress_bar, declare_columns, FROZEN_SCHEMA_CONTRACT
 import time
 import sys 
-
-from concurrent.futures import ThreadPoolExecutor, as_completed #this is used to multithreading. we use it to perform multiple API calls in parallel, which can significantly speed up the data fetching process.
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import ijson # Incremental JSON parser, auctions are yielded while the snapshot is still downloading
+import pyarrow as pa
 
 from wow_api_dlt.utilities import auth_util 
+from wow_api_dlt.utilities.dead_letter import dead_letter_store
+
+# Number of realm snapshots that are downloaded at the same time. Each open stream holds a connection
+# and an in-flight slot of the fetch engine while its auctions are parsed.
+AUCTION_STREAM_WINDOW = 8
+
+# Auctions are handed to dlt as Arrow record batches of up to this many rows, which skips dlt's
+# per-row normalisation. Column names match what dlt generated from the nested JSON (item.id -> item__id).
+ARROW_BATCH_ROWS = 50_000
+
+# time_left only takes the values SHORT, MEDIUM, LONG and VERY_LONG, so it is dictionary encoded like an enum
+TIME_LEFT_ARROW_TYPE = pa.dictionary(pa.int8(), pa.string())
+
+# Only the fields dim_auctions reads. Prices are integer copper amounts.
+# The nested bonus_lists/modifiers/context of an item are not used and are dropped while flattening.
+AUCTION_ARROW_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("item__id", pa.int64()),
+    ("item__pet_breed_id", pa.int64()),
+    ("item__pet_level", pa.int64()),
+    ("item__pet_quality_id", pa.int64()),
+    ("item__pet_species_id", pa.int64()),
+    ("bid", pa.int64()),
+    ("buyout", pa.int64()),
+    ("quantity", pa.int64()),
+    ("time_left", TIME_LEFT_ARROW_TYPE),
+    ("realm_id", pa.string()),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+])
+
+COMMODITY_ARROW_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("item__id", pa.int64()),
+    ("quantity", pa.int64()),
+    ("unit_price", pa.int64()),
+    ("time_left", TIME_LEFT_ARROW_TYPE),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+])
+
+# Declared table schemas matching the Arrow schemas above
+AUCTION_COLUMNS = declare_columns(
+    id="bigint",
+    item__id="bigint",
+    item__pet_breed_id="bigint",
+    item__pet_level="bigint",
+    item__pet_quality_id="bigint",
+    item__pet_species_id="bigint",
+    bid="bigint",
+    buyout="bigint",
+    quantity="bigint",
+    time_left="text",
+    realm_id="text",
+    timestamp="timestamp",
+)
+
+# --- Snapshot history ---
+# The auctions table only holds the latest snapshot of every realm. Every newly downloaded snapshot is also
+# appended to auction_history and listed in auction_snapshots, so prices can be followed over time.
+# Snapshots are appended realm by realm in time order, so the rows of one snapshot sit in consecutive DuckDB
+# row groups and the min/max zone maps of snapshot_id and snapshot_hour let a query for one snapshot or hour
+# skip the rest of the history. "Latest snapshot" queries keep using the auctions table.
+# dlt can not route the Arrow batches of one resource into a second table, so the auction batches carry their
+# snapshot in the Arrow schema metadata and two transformers fork them into the history tables.
+AUCTION_HISTORY_COLUMNS = {
+    **{name: column for name, column in AUCTION_COLUMNS.items() if name != "timestamp"},
+    **declare_columns(snapshot_id="bigint", snapshot_hour="timestamp"),
+}
+
+# One row per snapshot appended to auction_history. A download that fails halfway adds nothing to either table.
+AUCTION_SNAPSHOT_COLUMNS = declare_columns(
+    snapshot_id="bigint",
+    realm_id="text",
+    snapshot_hour="timestamp", # Hour Blizzard took the snapshot, from its Last-Modified header
+    last_modified="timestamp",
+    fetched_at="timestamp",
+    auction_count="bigint",
+)
+
+COMMODITY_COLUMNS = declare_columns(
+    id="bigint",
+    item__id="bigint",
+    quantity="bigint",
+    unit_price="bigint",
+    time_left="text",
+    timestamp="timestamp",
+)
+
+
+def _conditional_headers(validators):
+    """Builds If-Modified-Since / If-None-Match headers from the validators stored for a realm."""
+    headers = {}
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    return headers
+
+
+def _iter_auctions(response):
+    """
+    Yields the entries of the "auctions" array of a streamed snapshot one by one while the body is read.
+    Memory use is bounded by the chunk size and the parser buffer instead of the payload size.
+    """
+    parsed_auctions = ijson.sendable_list()
+    parser = ijson.items_coro(parsed_auctions, "auctions.item", use_float=True)
+    for chunk in response.iter_bytes():
+        parser.send(chunk)
+        yield from parsed_auctions
+        del parsed_auctions[:]
+    parser.close()
+    yield from parsed_auctions
+
+
+class _ArrowBatchBuilder:
+    """Collects flattened auctions column by column and turns them into Arrow record batches."""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._columns = {name: [] for name in schema.names}
+        self.rows = 0
+
+    def append(self, auction):
+        # Flatten the nested item the same way dlt did (item.pet_level -> item__pet_level)
+        for key, value in auction.pop("item", {}).items():
+            auction[f"item__{key}"] = value
+        for name, values in self._columns.items():
+            values.append(auction.get(name))
+        self.rows += 1
+
+    def is_full(self):
+        return self.rows >= ARROW_BATCH_ROWS
+
+    def flush(self):
+        """Returns the collected rows as a RecordBatch and starts a new one."""
+        batch = pa.RecordBatch.from_pydict(self._columns, schema=self.schema)
+        self._columns = {name: [] for name in self.schema.names}
+        self.rows = 0
+        return batch
+
+
+def _time_of_run_timestamp(time_of_run):
+    # The string used to be parsed by dlt, which read it as UTC. Keep it that way so old and new rows line up.
+    return datetime.strptime(time_of_run, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+def _snapshot_time(last_modified, fallback):
+    """When Blizzard took a snapshot, from its Last-Modified header."""
+    try:
+        return parsedate_to_datetime(last_modified).astimezone(timezone.utc)
+    except (TypeError, ValueError):
+        return fallback
+
+
+def _snapshot_id(realm_id, fetched_at):
+    """
+    Id of one downloaded realm snapshot: the Unix time of the run (`fetched_at`, an aware UTC datetime)
+    followed by the five digit connected realm ID.
+    Ids sort by time, and a download that was interrupted never shares its id with the one that retried it.
+    """
+    return int(fetched_at.timestamp()) * 100_000 + int(realm_id)
+
+
+def _tag_snapshot(batch, snapshot):
+    """Attaches the snapshot a batch belongs to as Arrow schema metadata, for the history transformers."""
+    return batch.replace_schema_metadata({key: str(value) for key, value in snapshot.items()})
+
+
+def _batch_snapshot(batch):
+    """Returns the snapshot a batch was tagged with, or None for batches that do not go to the history."""
+    metadata = batch.schema.metadata if isinstance(batch, pa.RecordBatch) else None
+    if not metadata or b"snapshot_id" not in metadata:
+        return None
+    return {key.decode(): value.decode() for key, value in metadata.items()}
 
 
 # Fetch AH items
-@dlt.resource(table_name="auctions", write_disposition="replace")
-def fetch_auction_house_items(test_mode=False):
+# Realms are replaced one by one (delete-insert on realm_id), so realms whose snapshot did not change
+# since the last run keep their rows while the changed ones are swapped out.
+@dlt.resource(table_name="auctions", write_disposition={"disposition": "merge", "strategy": "delete-insert"}, merge_key="realm_id",
+              columns=AUCTION_COLUMNS, schema_contract=FROZEN_SCHEMA_CONTRACT)
+def fetch_auction_house_items(test_mode=False, force_refresh=False, retry_failed_only=False, keep_history=True):
+    """
+    Fetches the auction house snapshot for every connected realm that changed since the last run (force_refresh=True fetches all).
+    retry_failed_only=True fetches only the failed realms. With keep_history=True new snapshots are also tagged for the history.
+    """
+    realm_validators = dlt.current.resource_state().setdefault("realm_validators", {})
     time_of_run = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
     print(f"run started at : {time_of_run}")
     realm_ids = fetch_realm_ids() # Fetch all connected realm IDs once
     if test_mode:
         realm_ids = realm_ids[:3] # Limit for testing
+    failed_realm_keys = dead_letter_store.pending("auctions")
+    if retry_failed_only:
+        realm_ids = [r_id for r_id in realm_ids if str(r_id) in failed_realm_keys]
 
     amount_of_realms = len(realm_ids)
     print(f"Total realms to fetch auction data for: {amount_of_realms}")
 
-    MAX_WORKERS = 10 # Adjust based on API rate limits and network latency for AH data
-
     current_processed_realms = 0
+    unchanged_realms = 0
+    run_timestamp = _time_of_run_timestamp(time_of_run)
+    # Real UTC time of the run for the snapshot ids. run_timestamp is local wall-clock time labelled UTC,
+    # it jumps back when the clocks do and would make newer snapshots sort before older ones.
+    fetched_at = datetime.fromtimestamp(int(time.time()), tz=timezone.utc)
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # Submit tasks for each realm ID
-        future_to_realm_id = {
-            executor.submit(
-                auth_util.get_api_response,
-                endpoint=f"/data/wow/connected-realm/{r_id}/auctions",
-                params={"{{connectedRealmId}}": r_id, "namespace": "dynamic-eu"}
-            ): r_id
-            for r_id in realm_ids
-        }
+    # Requests for each realm ID go to the shared fetch engine through a bounded window of open streams
+    realm_requests = (
+        (
+            r_id,
+            f"/data/wow/connected-realm/{r_id}/auctions",
+            {"{{connectedRealmId}}": r_id, "namespace": "dynamic-eu"},
+            None if force_refresh else _conditional_headers(realm_validators.get(r_id, {})),
+        )
+        for r_id in realm_ids
+    )
 
-        _update_progress_bar(current_processed_realms, amount_of_realms, "Fetching AH Items")
+    _update_progress_bar(current_processed_realms, amount_of_realms, "Fetching AH Items")
+
+    # Snapshots are time-sensitive, serve them before bulk crawls. A retry pass only re-drives old failures and waits its turn.
+    priority = auth_util.PRIORITY_LOW if retry_failed_only else auth_util.PRIORITY_HIGH
+    for realm_id, future in auth_util.iter_api_responses(realm_requests, priority=priority, window=AUCTION_STREAM_WINDOW, stream=True):
+        realm_batches = []
+        validators = None # Set once the whole snapshot has been read
+        try:
+            with future.result() as response:
+                if response.status_code == 304:
+                    # Snapshot has not changed since the last run, the rows already loaded for this realm stay as they are
+                    unchanged_realms += 1
+                else:
+                    response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+
+                    last_modified = response.headers.get("Last-Modified")
+                    append_history = keep_history and (last_modified is None or realm_validators.get(realm_id, {}).get("last_modified") != last_modified)
+                    snapshot_time = _snapshot_time(last_modified, fetched_at)
+                    snapshot = {
+                        "snapshot_id": _snapshot_id(realm_id, fetched_at),
+                        "realm_id": realm_id,
+                        "snapshot_hour": snapshot_time.replace(minute=0, second=0, microsecond=0).isoformat(),
+                    }
+
+                    # Every realm gets its own batches, which are dropped as a whole when its download fails
+                    batch = _ArrowBatchBuilder(AUCTION_ARROW_SCHEMA)
+                    realm_auctions = 0
+                    for auction in _iter_auctions(response):
+                        auction["realm_id"] = realm_id # Add realm_id to each auction item
+                        auction["timestamp"] = run_timestamp
+                        batch.append(auction)
+                        realm_auctions += 1
+                        if batch.is_full():
+                            realm_batches.append(_tag_snapshot(batch.flush(), snapshot) if append_history else batch.flush())
+                    if append_history:
+                        # The last batch of a snapshot carries its summary, even when it is empty
+                        realm_batches.append(_tag_snapshot(batch.flush(), {
+                            **snapshot,
+                            "last_modified": snapshot_time.isoformat(),
+                            "fetched_at": fetched_at.isoformat(),
+                            "auction_count": realm_auctions,
+                        }))
+                    elif batch.rows:
+                        realm_batches.append(batch.flush())
 
-        for future in as_completed(future_to_realm_id):
-            realm_id = future_to_realm_id[future]
-            
-            try:
-                response = future.result()
-                response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-                data = response.json()
-                
-                if "auctions" not in data:
-                    sys.stdout.write(f"\nWarning: 'auctions' key not found for realm ID: {realm_id}. Skipping.\n")
-                    sys.stdout.flush()
-                    continue
-
-                for auction in data["auctions"]:
-                    auction["realm_id"] = realm_id # Add realm_id to each auction item
-                    auction["timestamp"] = time_of_run
-                    yield auction 
-            except Exception as e:
-                # Print errors on a new line to not interfere with the progress bar
-                sys.stdout.write(f"\nError fetching data for realm ID {realm_id}: {e}\n")
-                sys.stdout.flush()
-            
-            current_processed_realms += 1
-            _update_progress_bar(current_processed_realms, amount_of_realms, "Fetching AH Items")
+                    if not realm_auctions:
+                        sys.stdout.write(f"\nWarning: No auctions found for realm ID: {realm_id}.\n")
+                        sys.stdout.flush()
+                    validators = {
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "etag": response.headers.get("ETag"),
+                    }
+
+            # The delete-insert on realm_id replaces the realm's previous snapshot with whatever is yielded,
+            # so nothing is yielded before the whole snapshot has been read
+            yield from realm_batches
+            # Only remember the validators once every row of the snapshot has been yielded
+            if validators is not None:
+                realm_validators[realm_id] = validators
+            if str(realm_id) in failed_realm_keys:
+                dead_letter_store.resolve("auctions", realm_id)
+        except Exception as e:
+            dead_letter_store.record("auctions", realm_id, f"/data/wow/connected-realm/{realm_id}/auctions", {"namespace": "dynamic-eu"}, e)
+            # Print errors on a new line to not interfere with the progress bar
+            sys.stdout.write(f"\nError fetching data for realm ID {realm_id}: {e}\n")
+            sys.stdout.flush()
+
+        current_processed_realms += 1
+        _update_progress_bar(current_processed_realms, amount_of_realms, "Fetching AH Items")
 
     sys.stdout.write("\n") # Final newline after progress bar completion
     sys.stdout.flush()
-    print(f"Finished fetching auction data for {current_processed_realms} realms.")
+    print(f"Finished fetching auction data for {current_processed_realms} realms ({unchanged_realms} unchanged since the last run).")
+
+
+# Forked from fetch_auction_house_items: auctions | fetch_auction_history
+@dlt.transformer(table_name="auction_history", write_disposition="append", columns=AUCTION_HISTORY_COLUMNS, schema_contract=FROZEN_SCHEMA_CONTRACT)
+def fetch_auction_history(batch):
+    """Appends the auctions of every new snapshot to the history, tagged with their snapshot_id and snapshot_hour."""
+    snapshot = _batch_snapshot(batch)
+    if snapshot is None or not batch.num_rows:
+        return
+    history = batch.select([name for name in AUCTION_ARROW_SCHEMA.names if name != "timestamp"])
+    history = history.append_column("snapshot_id", pa.repeat(pa.scalar(int(snapshot["snapshot_id"]), pa.int64()), batch.num_rows))
+    snapshot_hour = pa.scalar(datetime.fromisoformat(snapshot["snapshot_hour"]), pa.timestamp("us", tz="UTC"))
+    history = history.append_column("snapshot_hour", pa.repeat(snapshot_hour, batch.num_rows))
+    yield history.replace_schema_metadata(None)
+
+
+# Forked from fetch_auction_house_items: auctions | fetch_auction_snapshots
+@dlt.transformer(table_name="auction_snapshots", write_disposition="merge", primary_key="snapshot_id",
+                 columns=AUCTION_SNAPSHOT_COLUMNS, schema_contract=FROZEN_SCHEMA_CONTRACT)
+def fetch_auction_snapshots(batch):
+    """Lists every snapshot that was appended to the history completely."""
+    snapshot = _batch_snapshot(batch)
+    if snapshot is None or "auction_count" not in snapshot:
+        return
+    yield {
+        "snapshot_id": int(snapshot["snapshot_id"]),
+        "realm_id": snapshot["realm_id"],
+        "snapshot_hour": datetime.fromisoformat(snapshot["snapshot_hour"]),
+        "last_modified": datetime.fromisoformat(snapshot["last_modified"]),
+        "fetched_at": datetime.fromisoformat(snapshot["fetched_at"]),
+        "auction_count": int(snapshot["auction_count"]),
+    }
 
 
 # Fetch AH commodities
-@dlt.resource(table_name="commodities", write_disposition="append")
+# Every snapshot is keyed on the time Blizzard took it plus the auction id. Downloading the same snapshot
+# again replaces its rows instead of stacking another copy, so reruns are idempotent.
+# Old snapshots are folded into per-item aggregates by utilities.commodity_compaction.
+@dlt.resource(table_name="commodities", write_disposition={"disposition": "merge", "strategy": "delete-insert"}, primary_key=("timestamp", "id"),
+              columns=COMMODITY_COLUMNS, schema_contract=FROZEN_SCHEMA_CONTRACT)
 def fetch_ah_commodities():
+    """
+    Fetches the region-wide commodities snapshot, streamed and parsed incrementally.
+    timestamp is when Blizzard took the snapshot (its Last-Modified header), or the time of the run when that is missing.
+    """
     time_of_run = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
     print(f"run started at : {time_of_run}")
     print("Fetching Auction House Commodities...")
@@ -77,19 +349,27 @@ def fetch_ah_commodities():
     params = {
         "namespace": "dynamic-eu",
     }
+    run_timestamp = _time_of_run_timestamp(time_of_run)
+    batch = _ArrowBatchBuilder(COMMODITY_ARROW_SCHEMA)
+    commodity_batches = []
     try:
-        response = auth_util.get_api_response(endpoint=endpoint, params=params)
-        response.raise_for_status() # Check for HTTP errors
-        data = response.json()
-        if "auctions" not in data:
-            print("Warning: 'auctions' key not found in commodities response. No data to yield.")
-            return # Exit if no auctions
-        for auction in data["auctions"]:
-            auction["timestamp"] = time_of_run
-            yield auction
-        print("Successfully fetched Auction House Commodities.")
+        with auth_util.stream_api_request(endpoint=endpoint, params=params, priority=auth_util.PRIORITY_HIGH).result() as response:
+            response.raise_for_status() # Check for HTTP errors
+            snapshot_time = _snapshot_time(response.headers.get("Last-Modified"), run_timestamp)
+            commodities = 0
+            for auction in _iter_auctions(response):
+                auction["timestamp"] = snapshot_time
+                batch.append(auction)
+                commodities += 1
+                if batch.is_full():
+                    commodity_batches.append(batch.flush())
+            if batch.rows:
+                commodity_batches.append(batch.flush())
+        if not commodities:
+            print("Warning: No auctions found in commodities response.")
+            return
+        # A partial snapshot would be stored, and later compacted, under the time of the complete one
+        yield from commodity_batches
+        print(f"Successfully fetched {commodities} Auction House Commodities.")
     except Exception as e:
         print(f"Error fetching Auction House Commodities: {e}")
-
-
-
@@ -1,262 +1,425 @@
 import dlt
+import pandas as pd
 from wow_api_dlt import db
-from wow_api_dlt.utilities.dlt_util import fetch_item_class_and_subclasses, _update_progress_bar
-from wow_api_dlt.utilities.auth_util import get_api_response
+from wow_api_dlt.utilities.dlt_util import _update_progress_bar, declare_columns, FROZEN_SCHEMA_CONTRACT
+from wow_api_dlt.utilities.auth_util import submit_api_request
+from wow_api_dlt.utilities.crawl_checkpoint import CrawlCheckpoint
+from wow_api_dlt.utilities.dead_letter import dead_letter_store
+from wow_api_dlt.utilities.field_projection import FieldProjection
 import time
 import sys 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import wait, FIRST_COMPLETED
+from itertools import chain
 
-from wow_api_dlt.utilities import auth_util #this is used to multithreading. we use it to perform multiple API calls in parallel, which can significantly speed up the data fetching process.
+from wow_api_dlt.utilities import auth_util # The shared fetch engine behind auth_util performs multiple API calls in parallel, which can significantly speed up the data fetching process.
 FULL_ITEM_CONFIG = {
     "namespace": "static-eu",
     "orderby": "id",
     "api_results_per_page": 1000, # Max allowed by Blizzard API for search
-    "max_concurrent_requests": 10, # Number of concurrent API calls for pagination
+    "id_chunk_size": 1000, # Granularity of the item density histogram kept between runs
+    "target_items_per_range": 900, # Planned ranges aim for one page each, with some headroom for new items
+    "frontier_lookahead_chunks": 10, # How far past the highest ID found so far the crawl keeps probing
+    "max_item_id": 1000000, # Arbitrary large number to cap the search if no more items are found
+    "full_sync_interval_days": 7, # Re-verify the whole catalogue at most this often, other runs only look for new IDs
 }
 
-@dlt.resource(table_name="items", write_disposition="replace", primary_key="id")
-def fetch_items():
+# Columns of raw_items.items: what dim_items reads plus the fingerprint fields. Prices are in copper.
+ITEM_COLUMNS = declare_columns(
+    id="bigint",
+    name__en_us="text",
+    level="bigint",
+    required_level="bigint",
+    purchase_price="bigint",
+    purchase_quantity="bigint",
+    sell_price="bigint",
+    max_count="bigint",
+    item_class__id="bigint",
+    item_class__name__en_us="text",
+    item_subclass__id="bigint",
+    item_subclass__name__en_us="text",
+    inventory_type__type="text",
+    inventory_type__name__en_us="text",
+    quality__type="text",
+    quality__name__en_us="text",
+    is_equippable="bool",
+    is_stackable="bool",
+    media__id="bigint",
+)
+
+# Columns of raw_items.item_details that dim_item_details reads
+ITEM_DETAIL_COLUMNS = declare_columns(
+    id="bigint",
+    name__en_us="text",
+    description__en_us="text",
+    modified_crafting__id="bigint",
+    search_fingerprint="text",
+    preview_item__requirements__skill__profession__name__en_us="text",
+    preview_item__requirements__skill__profession__id="bigint",
+    preview_item__requirements__skill__display_string__en_us="text",
+    preview_item__requirements__level__display_string__en_us="text",
+    preview_item__requirements__reputation__display_string__en_us="text",
+    preview_item__requirements__reputation__faction__id="bigint",
+    preview_item__requirements__map__name__en_us="text",
+    preview_item__requirements__map__id="bigint",
+    preview_item__requirements__ability__spell__id="bigint",
+    preview_item__requirements__playable_classes__display_string__en_us="text",
+    preview_item__requirements__playable_races__display_string__en_us="text",
+    preview_item__requirements__playable_specializations__display_string__en_us="text",
+    preview_item__requirements__holiday__display_string__en_us="text",
+    preview_item__binding__name__en_us="text",
+    preview_item__unique_equipped__en_us="text",
+    preview_item__name_description__display_string__en_us="text",
+    preview_item__weapon__damage__display_string__en_us="text",
+    preview_item__weapon__damage__damage_class__name__en_us="text",
+    preview_item__weapon__attack_speed__display_string__en_us="text",
+    preview_item__weapon__dps__display_string__en_us="text",
+    preview_item__durability__display_string__en_us="text",
+    preview_item__item_starts_quest__quest__id="bigint",
+    preview_item__socket_bonus__en_us="text",
+    preview_item__gem_properties__effect__en_us="text",
+    preview_item__armor__display__display_string__en_us="text",
+    preview_item__shield_block__display__display_string__en_us="text",
+    preview_item__recipe__item__item__id="bigint",
+    preview_item__charges__display_string__en_us="text",
+    preview_item__set__item_set__name__en_us="text",
+    preview_item__set__item_set__id="bigint",
+    preview_item__modified_appearance_id="bigint",
+    preview_item__upgrades__display_string__en_us="text",
+)
+
+# The stats list is the only nested table of the details that dim_item_details joins
+ITEM_DETAIL_NESTED_HINTS = {
+    "preview_item__stats": {"columns": declare_columns(type__name__en_us="text", value="bigint")},
+}
+
+# Default projections: records are stripped down to the declared columns before they reach dlt
+ITEM_PROJECTION = FieldProjection.from_column_hints(ITEM_COLUMNS)
+ITEM_DETAIL_PROJECTION = FieldProjection.from_column_hints(ITEM_DETAIL_COLUMNS, ITEM_DETAIL_NESTED_HINTS)
+
+
+def _plan_item_ranges(id_histogram, first_id, last_id, id_chunk_size, target_items):
+    """
+    Splits [first_id, last_id] into ID ranges of about `target_items` items each, using the per-chunk
+    item counts of the last crawl (`id_histogram`, chunk index -> count). Sparse chunks share one range.
     """
-    Fetches all items from the Blizzard API using pagination and ID range fetching
-    to handle large datasets effectively.
+    ranges = []
+    range_start = first_id
+    expected_items = 0
+    for chunk_start in range(first_id, last_id + 1, id_chunk_size):
+        chunk_items = id_histogram.get(str((chunk_start - 1) // id_chunk_size), 0)
+        if expected_items and expected_items + chunk_items > target_items:
+            ranges.append((range_start, chunk_start - 1))
+            range_start = chunk_start
+            expected_items = 0
+        expected_items += chunk_items
+    ranges.append((range_start, last_id))
+    return ranges
+
+
+# Items are merged on id, so a run only has to yield the items it wants to add or update.
+@dlt.resource(table_name="items", write_disposition="merge", primary_key="id", columns=ITEM_COLUMNS, schema_contract=FROZEN_SCHEMA_CONTRACT)
+def fetch_items(full_sync=False, retry_failed_only=False, fields=None):
     """
-    print("Starting full item data extraction...")
+    Fetches items from the Blizzard API using pagination and ID range fetching, upwards from the highest known ID
+    unless a full sync is due. Failed pages are retried on the next run, retry_failed_only=True fetches only those.
+    """
+    projection = FieldProjection(fields) if fields else ITEM_PROJECTION
+    sync_state = dlt.current.resource_state()
+    highest_known_id = sync_state.get("highest_item_id", 0)
+    id_histogram = sync_state.get("id_histogram", {})
+    last_full_sync_at = sync_state.get("last_full_sync_at")
+    full_sync_due = last_full_sync_at is None or time.time() - last_full_sync_at > FULL_ITEM_CONFIG["full_sync_interval_days"] * 24 * 3600
+
+    id_chunk_size = FULL_ITEM_CONFIG["id_chunk_size"]
+    lookahead_ids = FULL_ITEM_CONFIG["frontier_lookahead_chunks"] * id_chunk_size
+    highest_known_chunk_end = -(-highest_known_id // id_chunk_size) * id_chunk_size
+
+    # Earlier failed pages are always re-driven, incremental runs would otherwise never revisit them
+    failed_page_keys = dead_letter_store.pending("items")
+
+    run_full_sync = (full_sync or full_sync_due or not highest_known_id) and not retry_failed_only
+    if retry_failed_only:
+        print(f"Retrying {len(failed_page_keys)} failed item search pages...")
+        first_id = 1
+        highest_id_fetched = highest_known_id
+    elif run_full_sync:
+        print("Starting full item data extraction...")
+        first_id = 1
+        highest_id_fetched = 0
+    else:
+        # Re-read the range holding the highest known ID, it may have been only partly filled last time
+        first_id = highest_known_chunk_end - id_chunk_size + 1
+        highest_id_fetched = highest_known_id
+        print(f"Starting incremental item data extraction from ID {first_id} (highest known ID: {highest_known_id})...")
     start_time = time.time()
 
+    # The ID space of the last crawl is split by its item density, past it (and on the first crawl) the crawl probes chunk by chunk
+    planned_ranges = []
+    next_probe_id = FULL_ITEM_CONFIG["max_item_id"] + 1 if retry_failed_only else first_id
+    if id_histogram and highest_known_chunk_end >= first_id and not retry_failed_only:
+        planned_ranges = _plan_item_ranges(id_histogram, first_id, highest_known_chunk_end, id_chunk_size, FULL_ITEM_CONFIG["target_items_per_range"])
+        next_probe_id = highest_known_chunk_end + 1
+
     total_items_fetched = 0
+    failed_pages = 0
+    completed_pages = 0
     all_yielded_ids = set() # To ensure unique items are yielded
+    pending_pages = {} # future -> (range_start, range_end, page_num)
+
+    def page_params(range_start, range_end, page_num):
+        return {
+            "namespace": FULL_ITEM_CONFIG["namespace"],
+            "orderby": FULL_ITEM_CONFIG["orderby"],
+            "_pageSize": FULL_ITEM_CONFIG["api_results_per_page"],
+            "_page": page_num,
+            "id": f"[{range_start},{range_end}]" # Filter by ID range
+        }
 
-    current_min_id = 1 
-
-    id_chunk_size = 1000  # Example: Fetch items with ID 1-1000, then 1001-2000, etc.
+    def submit_page(range_start, range_end, page_num):
+        # Every page of the crawl is there to see the current catalogue: the frontier chunk and the probes look
+        # for new items and a full sync re-verifies the known ones, so none of them may come from the response cache
+        future = submit_api_request(endpoint="/data/wow/search/item", params=page_params(range_start, range_end, page_num), priority=auth_util.PRIORITY_LOW, use_cache=False)
+        pending_pages[future] = (range_start, range_end, page_num)
 
-    highest_id_fetched = 0
+    for page_key in failed_page_keys:
+        submit_page(*map(int, page_key.split(",")))
+    for range_start, range_end in planned_ranges:
+        submit_page(range_start, range_end, 1)
+    if not retry_failed_only:
+        print(f"Submitted {len(planned_ranges)} planned ID ranges up to ID {highest_known_chunk_end if planned_ranges else first_id - 1}, probing beyond.")
 
     while True:
-        sys.stdout.write(f"\nProcessing ID range: [{current_min_id}, {current_min_id + id_chunk_size - 1}]...\n")
-        sys.stdout.flush()
+        # Keep probing past the highest ID found so far, the window moves up as new items are found
+        while next_probe_id <= min(highest_id_fetched + lookahead_ids, FULL_ITEM_CONFIG["max_item_id"]):
+            submit_page(next_probe_id, next_probe_id + id_chunk_size - 1, 1)
+            next_probe_id += id_chunk_size
 
-        range_start = current_min_id
-        range_end = current_min_id + id_chunk_size - 1
-
-        # Inner loop: Paginate within the current ID range
-        page_num = 1
-        page_futures = []
-        paginating_in_range = True
-
-        # Use ThreadPoolExecutor for concurrent page fetching within an ID range
-        with ThreadPoolExecutor(max_workers=FULL_ITEM_CONFIG["max_concurrent_requests"]) as executor:
-            while paginating_in_range:
-                params = {
-                    "namespace": FULL_ITEM_CONFIG["namespace"],
-                    "orderby": FULL_ITEM_CONFIG["orderby"],
-                    "_pageSize": FULL_ITEM_CONFIG["api_results_per_page"],
-                    "_page": page_num,
-                    "id": f"[{range_start},{range_end}]" # Filter by ID range
-
-                }
-                endpoint = "/data/wow/search/item"
-                filter_description = f"ID Range [{range_start},{range_end}] Page {page_num}"
-
-                # Submit the API call to the thread pool
-                future = executor.submit(get_api_response, endpoint=endpoint, params=params)
-                page_futures.append((future, filter_description, page_num))
-
-                if len(page_futures) >= FULL_ITEM_CONFIG["max_concurrent_requests"]:
-                    for processed_future, desc, p_num in page_futures:
-                        try:
-                            response = processed_future.result()
-                            data = response.json()
-                            results = data.get("results", [])
-
-                            if not results:
-                                sys.stdout.write(f"\nNo more results on {desc}. Stopping pagination for this ID range.\n")
-                                sys.stdout.flush()
-                                paginating_in_range = False # No more results for this range
-                                break # Exit inner future processing loop
-                            
-                            for result in results:
-                                if "data" in result:
-                                    item_id = result["data"].get("id")
-                                    if item_id is not None:
-                                        # Update highest ID found
-                                        if item_id > highest_id_fetched:
-                                            highest_id_fetched = item_id
-                                        
-                                        if item_id not in all_yielded_ids:
-                                            # You can refine the data before yielding here if needed
-                                            yield result["data"]
-                                            all_yielded_ids.add(item_id)
-                                            total_items_fetched += 1
-                                else:
-                                    sys.stdout.write(f"\nWarning: 'data' field missing in result for {desc}. Result: {result}\n")
-                                    sys.stdout.flush()
-                            
-                            _update_progress_bar(len(all_yielded_ids), total_items_fetched + 1, f"Fetching items in {desc}") # Progress bar logic here might need refinement
-                            
-                        except Exception as e:
-                            sys.stdout.write(f"\nError during fetch for {desc}: {e}\n")
-                            sys.stdout.flush()
-                            # Continue to next future even if one fails
-                    
-                    page_futures = [] # Clear futures after processing a batch
-
-                    if not paginating_in_range: # If we stopped in the inner loop, break outer too
-                        break
-                    
-                page_num += 1 # Move to the next page
-
-            # Process any remaining futures if the loop ended early
-            for processed_future, desc, p_num in page_futures:
-                try:
-                    response = processed_future.result()
-                    data = response.json()
-                    results = data.get("results", [])
-
-                    if not results:
-                        sys.stdout.write(f"\nNo more results on {desc}. Stopping pagination for this ID range.\n")
-                        sys.stdout.flush()
-                        paginating_in_range = False
-                        break
-                    
-                    for result in results:
-                        if "data" in result:
-                            item_id = result["data"].get("id")
-                            if item_id is not None:
-                                if item_id > highest_id_fetched:
-                                    highest_id_fetched = item_id
-                                if item_id not in all_yielded_ids:
-                                    yield result["data"]
-                                    all_yielded_ids.add(item_id)
-                                    total_items_fetched += 1
-                        else:
-                            sys.stdout.write(f"\nWarning: 'data' field missing in result for {desc}. Result: {result}\n")
-                            sys.stdout.flush()
-                    
-                    _update_progress_bar(len(all_yielded_ids), total_items_fetched + 1, f"Fetching items in {desc}")
-                except Exception as e:
-                    sys.stdout.write(f"\nError during fetch for {desc}: {e}\n")
-                    sys.stdout.flush()
+        if not pending_pages:
+            break
 
-        sys.stdout.write("\n")
-        sys.stdout.flush()
-        
+        done_pages, _ = wait(pending_pages, return_when=FIRST_COMPLETED)
+        for future in done_pages:
+            range_start, range_end, page_num = pending_pages.pop(future)
+            desc = f"ID Range [{range_start},{range_end}] Page {page_num}"
+            page_key = f"{range_start},{range_end},{page_num}"
+            try:
+                response = future.result()
+                response.raise_for_status()
+                data = response.json()
+                results = data.get("results", [])
+
+                if page_num == 1:
+                    # Dense range, fetch the remaining pages right away
+                    for next_page in range(2, data.get("pageCount", 1) + 1):
+                        submit_page(range_start, range_end, next_page)
+
+                for result in results:
+                    if "data" in result:
+                        item_id = result["data"].get("id")
+                        if item_id is not None:
+                            # Update highest ID found
+                            if item_id > highest_id_fetched:
+                                highest_id_fetched = item_id
+
+                            if item_id not in all_yielded_ids:
+                                yield projection.apply(result["data"])
+                                all_yielded_ids.add(item_id)
+                                total_items_fetched += 1
+                    else:
+                        sys.stdout.write(f"\nWarning: 'data' field missing in result for {desc}. Result: {result}\n")
+                        sys.stdout.flush()
 
-        
-        previous_total_items_fetched = total_items_fetched
-        
-        # Advance to the next ID range
-        current_min_id += id_chunk_size
+                if page_key in failed_page_keys:
+                    dead_letter_store.resolve("items", page_key)
+            except Exception as e:
+                failed_pages += 1
+                dead_letter_store.record("items", page_key, "/data/wow/search/item", page_params(range_start, range_end, page_num), e)
+                sys.stdout.write(f"\nError during fetch for {desc}: {e}\n")
+                sys.stdout.flush()
+                # Continue with the other pages even if one fails, they are retried on the next run
 
-        if (current_min_id - id_chunk_size) > (highest_id_fetched + id_chunk_size) and (total_items_fetched == previous_total_items_fetched):
-             print(f"Stopping fetch: No new items found in range [{current_min_id - id_chunk_size}, {current_min_id - 1}] and past highest ID {highest_id_fetched}.")
-             break # Break the outer while True loop
+            completed_pages += 1
+            _update_progress_bar(completed_pages, completed_pages + len(pending_pages), "Fetching item pages")
 
-        # To prevent excessively large IDs if there are gaps
-        if current_min_id > 1000000: # Arbitrary large number to cap search if no more items are found
-            print(f"Stopping fetch: Reached practical ID limit ({current_min_id}).")
-            break
+    sys.stdout.write("\n")
+    sys.stdout.flush()
+    if retry_failed_only:
+        print(f"Retried failed pages, {len(dead_letter_store.pending('items'))} still failing.")
+        return
+    if next_probe_id > FULL_ITEM_CONFIG["max_item_id"]:
+        print(f"Stopping fetch: Reached practical ID limit ({FULL_ITEM_CONFIG['max_item_id']}).")
+    else:
+        print(f"Stopping fetch: No new items found in the {lookahead_ids} IDs past highest ID {highest_id_fetched}.")
+
+    # Only reached once every item has been yielded, so the state never runs ahead of the loaded data
+    scanned_histogram = {}
+    for item_id in all_yielded_ids:
+        chunk_index = str((item_id - 1) // id_chunk_size)
+        scanned_histogram[chunk_index] = scanned_histogram.get(chunk_index, 0) + 1
+    if not run_full_sync:
+        # Chunks below the scanned part keep their counts from the last full sync
+        first_chunk_index = (first_id - 1) // id_chunk_size
+        scanned_histogram = {**{index: count for index, count in id_histogram.items() if int(index) < first_chunk_index}, **scanned_histogram}
+    sync_state["id_histogram"] = scanned_histogram
+    sync_state["highest_item_id"] = max(highest_known_id, highest_id_fetched)
+    if run_full_sync and failed_pages == 0:
+        sync_state["last_full_sync_at"] = time.time()
 
     end_time = time.time()
     duration = end_time - start_time
 
-    print(f"\n--- Full Item Data Extraction Summary ---")
-    print(f"✅ Fetched total {total_items_fetched} unique items.")
+    print(f"\n--- {'Full' if run_full_sync else 'Incremental'} Item Data Extraction Summary ---")
+    print(f"✅ Fetched total {total_items_fetched} unique items in {completed_pages} pages.")
+    if failed_pages:
+        print(f"⚠️ {failed_pages} pages failed to fetch.")
     print(f"✅ Total extraction time: {duration:.2f} seconds.")
     print("------------------------------------")
 
-@dlt.resource(write_disposition="replace" ,table_name="item_details")
-def fetch_item_details():
-    db_path = "wow_api_dbt/wow_api_data.duckdb"
+# Search-level fields that go into an item's fingerprint. When one of them changes the item details are refetched.
+# Only fields the preview_item of the item document depends on are part of it. The name is read from the search
+# results by dim_item_details, and prices and media are not part of the detail columns, so changes to those
+# are picked up from raw_items.items without a /data/wow/item/{id} call.
+ITEM_FINGERPRINT_COLUMNS = [
+    "level", "required_level", "quality__type",
+    "item_class__id", "item_subclass__id", "inventory_type__type",
+    "max_count", "is_equippable", "is_stackable",
+]
 
-    item_class_dict = fetch_item_class_and_subclasses()
-    
-    MAX_WORKERS = 10
-
-    all_item_ids_to_fetch = []
-    item_id_context = {} 
-
-    print("Collecting item IDs from DuckDB...")
-    for item_class_id, value in item_class_dict.items():
-        item_class_name_raw = value.get("name", f"Unknown Class {item_class_id}")
-        item_class_name_sanitized = item_class_name_raw.lower().replace(" ", "_").replace("-", "_")
-
-        subclass_ids = value.get("subclass_ids", [])
-        if not subclass_ids:
-            subclass_ids = [None] 
-
-        for subclass_id in subclass_ids:
-            with db.DuckDBConnection(db_path) as db_handler:
-                if subclass_id is not None:
-                    query = f"SELECT DISTINCT id FROM raw_items.items WHERE item_class__id = {item_class_id} AND item_subclass__id = {subclass_id}"
-                else:
-                    query = f"SELECT DISTINCT id FROM raw_items.items WHERE item_class__id = {item_class_id}"
-
-                df = db_handler.query(query)
-                #df = df[:1] # Keep this commented out if you want to fetch all items for actual runs
-
-            for _, row in df.iterrows():
-                item_id = int(row["id"])
-                all_item_ids_to_fetch.append(item_id)
-                item_id_context[item_id] = { 
-                    "item_class_id": item_class_id,
-                    "class_name_sanitized": item_class_name_sanitized,
-                    "class_name_raw": item_class_name_raw,
-                    "subclass_id": subclass_id
-                }
-
-    amount_of_details = len(all_item_ids_to_fetch)
-    print(f"Total unique items to fetch details for: {amount_of_details}")
-
-    # Manual progress bar variables
-    current_processed_count = 0
-    bar_length = 50 # Length of the progress bar in characters
-    
-    # This allows us to use a thread pool to fetch item details concurrently
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_item_id = {
-            executor.submit(auth_util.get_api_response, endpoint=f"/data/wow/item/{item_id}", params={"namespace": "static-eu"}): item_id
-            for item_id in all_item_ids_to_fetch
-        }
 
-        # Initial display of the progress bar
-        _update_progress_bar(current_processed_count, amount_of_details, bar_length)
+def _items_to_refresh(db_handler):
+    """
+    Returns a DataFrame (id, fingerprint, changed) of the items in raw_items.items whose details are missing from
+    raw_items.item_details, or whose search fingerprint changed since their details were fetched (changed=True).
+    """
+    columns = db_handler.query(
+        "SELECT table_name, column_name FROM information_schema.columns "
+        "WHERE table_schema = 'raw_items' AND table_name IN ('items', 'item_details')"
+    )
+    if columns.empty:
+        return pd.DataFrame(columns=["id", "fingerprint", "changed"])
+    item_columns = set(columns.loc[columns["table_name"] == "items", "column_name"])
+    detail_columns = set(columns.loc[columns["table_name"] == "item_details", "column_name"])
+
+    fingerprint_columns = [column for column in ITEM_FINGERPRINT_COLUMNS if column in item_columns]
+    if not fingerprint_columns:
+        return pd.DataFrame(columns=["id", "fingerprint", "changed"])
+    fingerprint_sql = "md5(concat_ws('|', " + ", ".join(f"coalesce(CAST(i.{column} AS VARCHAR), '')" for column in fingerprint_columns) + "))"
+
+    if "search_fingerprint" in detail_columns:
+        query = f"""
+            SELECT i.id, {fingerprint_sql} AS fingerprint, d.id IS NOT NULL AS changed
+            FROM raw_items.items AS i
+            LEFT JOIN raw_items.item_details AS d ON d.id = i.id
+            WHERE d.id IS NULL OR d.search_fingerprint IS DISTINCT FROM {fingerprint_sql}
+            ORDER BY i.id
+        """
+    else:
+        # No details loaded yet (or loaded before fingerprints were stored), everything is fetched once
+        changed_sql = "TRUE" if detail_columns else "FALSE"
+        query = f"SELECT i.id, {fingerprint_sql} AS fingerprint, {changed_sql} AS changed FROM raw_items.items AS i ORDER BY i.id"
+
+    df = db_handler.query(query)
+    if df.empty:
+        return pd.DataFrame(columns=["id", "fingerprint", "changed"])
+    return df
+
+
+# Details are merged on id, so only new items and items whose search fingerprint changed are fetched.
+@dlt.resource(write_disposition="merge", primary_key="id", table_name="item_details", columns=ITEM_DETAIL_COLUMNS,
+              nested_hints=ITEM_DETAIL_NESTED_HINTS, schema_contract=FROZEN_SCHEMA_CONTRACT)
+def fetch_item_details(retry_failed_only=False, fields=None):
+    """
+    Fetches the item documents of new items and of items whose preview-relevant search fields changed.
+    An interrupted crawl resumes from its checkpoint, retry_failed_only=True fetches only the failed items.
+    """
+    projection = FieldProjection(fields) if fields else ITEM_DETAIL_PROJECTION
+    db_path = "wow_api_dbt/wow_api_data.duckdb"
+    completed_crawls = dlt.current.source_state().setdefault("completed_crawls", {})
+
+    checkpoint = CrawlCheckpoint("item_details")
+    try:
+        # Replay what an interrupted crawl already fetched
+        if checkpoint.begin(completed_crawls.get("item_details")):
+            replayed = 0
+            for _, data in checkpoint.records():
+                if data is not None:
+                    replayed += 1
+                    yield projection.apply(data)
+            print(f"Resumed interrupted crawl: replayed {replayed} checkpointed item details.")
+        done_keys = checkpoint.done_keys()
+
+        # One columnar query for every item that needs its details (re)fetched
+        with db.DuckDBConnection(db_path) as db_handler:
+            items_to_fetch = _items_to_refresh(db_handler)
+        items_to_fetch = items_to_fetch[~items_to_fetch["id"].astype(int).astype(str).isin(done_keys)]
+        failed_item_keys = dead_letter_store.pending("item_details")
+        if retry_failed_only:
+            print(f"Retrying {len(failed_item_keys)} failed item details...")
+            items_to_fetch = items_to_fetch[items_to_fetch["id"].astype(int).astype(str).isin(failed_item_keys)]
+
+        amount_of_details = len(items_to_fetch)
+        print(f"Total unique items to fetch details for: {amount_of_details}")
+        if not amount_of_details:
+            print("Item details are up to date.")
+            completed_crawls["item_details"] = checkpoint.crawl_id
+            return
+
+        current_processed_count = 0
+
+        # Requests are fed to the shared fetch engine through a bounded window, so only a few hundred
+        # responses are ever pending no matter how many items there are
+        def item_requests(items):
+            return (
+                ((item_id, fingerprint), f"/data/wow/item/{item_id}", {"namespace": "static-eu"})
+                for item_id, fingerprint in zip(items["id"].astype(int).tolist(), items["fingerprint"].tolist())
+            )
+
+        changed_items = items_to_fetch["changed"].astype(bool)
+        responses = chain(
+            # New items may come from the response cache, any cached document of theirs is as new as it gets
+            auth_util.iter_api_responses(item_requests(items_to_fetch[~changed_items]), priority=auth_util.PRIORITY_LOW),
+            # A cached document of a changed item would be the stale one the fingerprint just flagged
+            auth_util.iter_api_responses(item_requests(items_to_fetch[changed_items]), priority=auth_util.PRIORITY_LOW, use_cache=False),
+        )
 
-        for future in as_completed(future_to_item_id):
-            item_id = future_to_item_id[future]
-            context = item_id_context[item_id]
-            item_class_id = context["item_class_id"]
-            item_class_name_sanitized = context["class_name_sanitized"]
-            item_class_name_raw = context["class_name_raw"]
-            subclass_id = context["subclass_id"]
+        # Initial display of the progress bar
+        _update_progress_bar(current_processed_count, amount_of_details, "Fetching item details")
 
+        for (item_id, fingerprint), future in responses:
             try:
-                response = future.result() 
+                response = future.result()
+                response.raise_for_status()
                 data = response.json()
 
                 if not isinstance(data, dict) or "id" not in data:
                     # Print full message on a new line for invalid data, then update progress
+                    dead_letter_store.record("item_details", item_id, f"/data/wow/item/{item_id}", {"namespace": "static-eu"}, "Invalid data format")
                     sys.stdout.write(f"\nWarning: Invalid data format for item {item_id}\n")
                     sys.stdout.flush()
                     continue
 
+                data = projection.apply(data)
+                data["search_fingerprint"] = fingerprint
+                checkpoint.record(item_id, data)
+                if str(item_id) in failed_item_keys:
+                    dead_letter_store.resolve("item_details", item_id)
                 yield data
 
             except Exception as e:
                 # Print full message on a new line for errors, then update progress
+                dead_letter_store.record("item_details", item_id, f"/data/wow/item/{item_id}", {"namespace": "static-eu"}, e)
                 sys.stdout.write(f"\nError fetching item {item_id}: {e}\n")
-                sys.stdout.write(f"  Class: {item_class_name_raw}, Subclass: {subclass_id}\n")
                 sys.stdout.flush()
                 continue
-            
+
             # Increment and update progress bar
             current_processed_count += 1
-            _update_progress_bar(current_processed_count, amount_of_details, bar_length)
+            _update_progress_bar(current_processed_count, amount_of_details, "Fetching item details")
 
-    # Final newline to ensure subsequent prints appear on a new line
-    sys.stdout.write("\n")
-    sys.stdout.flush()
-    print(f"Finished fetching details for all items. Total processed: {current_processed_count} successfully.")
-
-
-       
+        # Final newline to ensure subsequent prints appear on a new line
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+        print(f"Finished fetching details for all items. Total processed: {current_processed_count} successfully.")
+        completed_crawls["item_details"] = checkpoint.crawl_id
+    finally:
+        checkpoint.close()
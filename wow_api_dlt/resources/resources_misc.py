@@ -1,40 +1,143 @@
 import dlt
 from wow_api_dlt import db
-from wow_api_dlt.utilities.dlt_util import fetch_realm_ids, _update_progress_bar
+from wow_api_dlt.utilities.dlt_util import fetch_realm_ids, _update_progress_bar, declare_columns, FROZEN_SCHEMA_CONTRACT
+from wow_api_dlt.utilities.crawl_checkpoint import CrawlCheckpoint
+from wow_api_dlt.utilities.dead_letter import dead_letter_store
+from wow_api_dlt.utilities.field_projection import FieldProjection
 import sys 
 
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 
-from wow_api_dlt.utilities import auth_util #this is used to multithreading. we use it to perform multiple API calls in parallel, which can significantly speed up the data fetching process.
+from wow_api_dlt.utilities import auth_util # The shared fetch engine behind auth_util performs multiple API calls in parallel, which can significantly speed up the data fetching process.
 
-@dlt.resource(table_name="item_media", write_disposition="replace")
-def fetch_media_hrfs():
+ITEM_MEDIA_COLUMNS = declare_columns(media_id="bigint", url="text")
+
+# Columns of raw_misc.realm_data and its realms list that dim_realms reads
+REALM_DATA_COLUMNS = declare_columns(
+    id="bigint",
+    population__name__en_us="text",
+    status__name__en_us="text",
+    has_queue="bool",
+    mythic_leaderboards__href="text",
+)
+REALM_DATA_NESTED_HINTS = {
+    "realms": {"columns": declare_columns(
+        id="bigint",
+        name__en_us="text",
+        region__id="bigint",
+        region__name__en_us="text",
+        category__en_us="text",
+        timezone="text",
+        type__name__en_us="text",
+        is_tournament="bool",
+    )},
+}
+REALM_DATA_PROJECTION = FieldProjection.from_column_hints(REALM_DATA_COLUMNS, REALM_DATA_NESTED_HINTS)
+
+# Realm documents (names, regions, population, queue status) barely change, so they are served from the
+# local response cache for this long before they are fetched again
+REALM_DATA_CACHE_TTL_SECONDS = 6 * 3600
+
+def _icon_url(assets):
+    """The icon URL among the assets of a media document, or None."""
+    for asset in assets if isinstance(assets, list) else []:
+        if asset.get("key") == "icon":
+            url = asset.get("value")
+            return url if isinstance(url, str) and url.startswith("http") else None
+    return None
+
+
+def _search_item_media(media_ids):
+    """
+    Yields (media_id, media_row) for the `media_ids` found by the media search, media_row is None without an icon.
+    Failed pages are skipped, their media are left to the per-ID requests.
+    """
+    params = {
+        "namespace": "static-eu",
+        "tags": "item",
+        "orderby": "id",
+        "id": f"[{min(media_ids)},{max(media_ids)}]",
+    }
+    for page_num, future in auth_util.iter_search_pages("/data/wow/search/media", params, priority=auth_util.PRIORITY_LOW):
+        try:
+            response = future.result()
+            response.raise_for_status()
+            results = response.json().get("results", [])
+        except Exception as e:
+            sys.stdout.write(f"\nError fetching media search page {page_num}: {e}\n")
+            sys.stdout.flush()
+            continue
+        for result in results:
+            data = result.get("data", {})
+            media_id = data.get("id")
+            if media_id in media_ids:
+                url = _icon_url(data.get("assets"))
+                yield media_id, {"media_id": media_id, "url": url} if url else None
+
+
+# Merged on media_id, so a retry pass over a few failed media IDs does not wipe the table
+@dlt.resource(table_name="item_media", write_disposition="merge", primary_key="media_id", columns=ITEM_MEDIA_COLUMNS, schema_contract=FROZEN_SCHEMA_CONTRACT)
+def fetch_media_hrfs(retry_failed_only=False, use_search=True):
+    """
+    Fetches the icon URL for every media ID referenced by raw_items.items, in bulk from the media search when use_search=True.
+    An interrupted crawl resumes from its checkpoint, retry_failed_only=True fetches only the failed media IDs.
+    """
     db_path = "wow_api_dbt/wow_api_data.duckdb"
-    
-    media_ids_to_fetch = []
-    with db.DuckDBConnection(db_path) as db_handler:
-        df = db_handler.query("SELECT DISTINCT media__id FROM raw_items.items WHERE media__id IS NOT NULL")
-        # df = df[:100] # For testing purposes, limit to 100 rows
-        for _, row in df.iterrows():
-            try:
-                media_id = int(row["media__id"])
-                media_ids_to_fetch.append(media_id)
-            except (ValueError, TypeError):
-                print(f"Skipping invalid media_id: {row['media__id']}")
-                continue
+    completed_crawls = dlt.current.source_state().setdefault("completed_crawls", {})
 
-    amount_of_media = len(media_ids_to_fetch)
-    print(f"Total unique media IDs to fetch: {amount_of_media}")
+    checkpoint = CrawlCheckpoint("item_media")
+    try:
+        # Yield an interrupted crawl's icons again, they were never loaded
+        if checkpoint.begin(completed_crawls.get("item_media")):
+            replayed = 0
+            for _, media_row in checkpoint.records():
+                if media_row is not None:
+                    replayed += 1
+                    yield media_row
+            print(f"Resumed interrupted crawl: replayed {replayed} checkpointed media HRFs.")
+        done_keys = checkpoint.done_keys()
+        failed_media_keys = dead_letter_store.pending("item_media")
+        if retry_failed_only:
+            print(f"Retrying {len(failed_media_keys)} failed media IDs...")
 
-    MAX_WORKERS_MEDIA_FETCH = 10 # You can adjust this, similar to other resources
+        media_ids_to_fetch = []
+        with db.DuckDBConnection(db_path) as db_handler:
+            df = db_handler.query("SELECT DISTINCT media__id FROM raw_items.items WHERE media__id IS NOT NULL")
+            # df = df[:100] # For testing purposes, limit to 100 rows
+            for _, row in df.iterrows():
+                try:
+                    media_id = int(row["media__id"])
+                    if str(media_id) in done_keys or (retry_failed_only and str(media_id) not in failed_media_keys):
+                        continue
+                    media_ids_to_fetch.append(media_id)
+                except (ValueError, TypeError):
+                    print(f"Skipping invalid media_id: {row['media__id']}")
+                    continue
+
+        if use_search and not retry_failed_only and media_ids_to_fetch:
+            searched_media_ids = set()
+            for media_id, media_row in _search_item_media(set(media_ids_to_fetch)):
+                if media_id in searched_media_ids:
+                    continue
+                searched_media_ids.add(media_id)
+                checkpoint.record(media_id, media_row)
+                if media_row is not None:
+                    yield media_row
+                if str(media_id) in failed_media_keys:
+                    dead_letter_store.resolve("item_media", media_id)
+            media_ids_to_fetch = [media_id for media_id in media_ids_to_fetch if media_id not in searched_media_ids]
+            print(f"Found {len(searched_media_ids)} media through the media search.")
 
-    current_processed_count = 0
-    bar_length = 50
+        amount_of_media = len(media_ids_to_fetch)
+        print(f"Total unique media IDs to fetch: {amount_of_media}")
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS_MEDIA_FETCH) as executor:
+        current_processed_count = 0
+        bar_length = 50
+
+        # Every media ID is submitted to the shared fetch engine, which keeps the requests in flight concurrently
         future_to_media_id = {
-            executor.submit(auth_util.get_api_response, endpoint=f"/data/wow/media/item/{media_id}", params={"namespace": "static-eu"}): media_id
+            auth_util.submit_api_request(endpoint=f"/data/wow/media/item/{media_id}", params={"namespace": "static-eu"}, priority=auth_util.PRIORITY_LOW): media_id
             for media_id in media_ids_to_fetch
         }
 
@@ -44,10 +147,12 @@ def fetch_media_hrfs():
             media_id = future_to_media_id[future]
             try:
                 response = future.result()
+                response.raise_for_status()
                 data = response.json()
 
                 assets = data.get("assets", [])
                 if not isinstance(assets, list):
+                    dead_letter_store.record("item_media", media_id, f"/data/wow/media/item/{media_id}", {"namespace": "static-eu"}, "Invalid assets format")
                     sys.stdout.write(f"\nWarning: Invalid assets format for media {media_id}. Skipping.\n")
                     sys.stdout.flush()
                     continue
@@ -57,44 +162,88 @@ def fetch_media_hrfs():
                     if asset.get("key") == "icon":
                         url = asset.get("value")
                         if isinstance(url, str) and url.startswith("http"):
-                            yield {
+                            media_row = {
                                 "media_id": media_id,
                                 "url": url
                             }
+                            checkpoint.record(media_id, media_row)
+                            yield media_row
                             found_icon = True
                             break # Found the icon, no need to check other assets for this media_id
                         else:
                             sys.stdout.write(f"\nWarning: Invalid or missing URL for media {media_id}. Skipping.\n")
                             sys.stdout.flush()
                             break # Invalid URL, break from inner loop
-                
-                if not found_icon and assets: # If assets exist but no valid icon was found
-                     sys.stdout.write(f"\nWarning: No valid icon asset found for media {media_id}.\n")
-                     sys.stdout.flush()
+
+                if not found_icon:
+                    checkpoint.record(media_id) # Fetched fine, there is just no icon to load
+                    if assets: # If assets exist but no valid icon was found
+                        sys.stdout.write(f"\nWarning: No valid icon asset found for media {media_id}.\n")
+                        sys.stdout.flush()
+
+                if str(media_id) in failed_media_keys:
+                    dead_letter_store.resolve("item_media", media_id)
 
             except Exception as e:
+                dead_letter_store.record("item_media", media_id, f"/data/wow/media/item/{media_id}", {"namespace": "static-eu"}, e)
                 sys.stdout.write(f"\nError fetching media {media_id}: {e}\n")
                 sys.stdout.flush()
                 continue
-            
+
             current_processed_count += 1
             _update_progress_bar(current_processed_count, amount_of_media, "Fetching Media HRFs")
-    
-    sys.stdout.write("\n")
-    sys.stdout.flush()
-    print(f"Finished fetching media HRFs for {current_processed_count} media IDs.")
+
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+        print(f"Finished fetching media HRFs for {current_processed_count} media IDs.")
+        completed_crawls["item_media"] = checkpoint.crawl_id
+    finally:
+        checkpoint.close()
 
     # Fetch data about connected realms    
-@dlt.resource(table_name="realm_data", write_disposition="replace")
-def fetch_realm_data():
-    for realm_id in fetch_realm_ids():
-        endpoint = f"/data/wow/connected-realm/{realm_id}"
-        params = {                
-            "{{connectedRealmId}}" : realm_id,
-            "namespace" : "dynamic-eu",
-            }
-        response = auth_util.get_api_response(endpoint=endpoint, params=params)
+@dlt.resource(table_name="realm_data", write_disposition="replace", columns=REALM_DATA_COLUMNS,
+              nested_hints=REALM_DATA_NESTED_HINTS, schema_contract=FROZEN_SCHEMA_CONTRACT)
+def fetch_realm_data(fields=None, use_search=True):
+    """
+    Fetches the connected realm documents, in bulk from the connected realm search when use_search=True.
+    The table is replaced, so a realm that fails after the engine's retries fails the load instead of being dropped.
+    """
+    projection = FieldProjection(fields) if fields else REALM_DATA_PROJECTION
+    realm_ids = fetch_realm_ids()
+    fetched_realms = 0
+    searched_realm_ids = set()
+    if use_search:
+        search_params = {"namespace": "dynamic-eu", "orderby": "id"}
+        for page_num, future in auth_util.iter_search_pages("/data/wow/search/connected-realm", search_params, cache_ttl=REALM_DATA_CACHE_TTL_SECONDS):
+            try:
+                response = future.result()
+                response.raise_for_status()
+                results = response.json().get("results", [])
+            except Exception as e:
+                print(f"Error fetching connected realm search page {page_num}, falling back to single realm requests: {e}")
+                continue
+            for result in results:
+                data = result.get("data", {})
+                realm_id = str(data.get("id"))
+                if realm_id not in realm_ids or realm_id in searched_realm_ids:
+                    continue
+                searched_realm_ids.add(realm_id)
+                # Search results carry no link to the realm's Mythic+ leaderboards, it is the one of the realm document
+                data.setdefault("mythic_leaderboards", {"href": f"{auth_util.BASE_URL}/data/wow/connected-realm/{realm_id}/mythic-leaderboard/?namespace=dynamic-eu"})
+                yield projection.apply(data)
+                fetched_realms += 1
+
+    realm_requests = (
+        (
+            realm_id,
+            f"/data/wow/connected-realm/{realm_id}",
+            {"{{connectedRealmId}}": realm_id, "namespace": "dynamic-eu"},
+        )
+        for realm_id in realm_ids if realm_id not in searched_realm_ids
+    )
+    for realm_id, future in auth_util.iter_api_responses(realm_requests, cache_ttl=REALM_DATA_CACHE_TTL_SECONDS):
+        response = future.result()
         response.raise_for_status()
-        data = response.json()
-        yield data
-        print(f"Yieldat connected realm {realm_id}!")
+        yield projection.apply(response.json())
+        fetched_realms += 1
+    print(f"Fetched {fetched_realms} connected realms.")
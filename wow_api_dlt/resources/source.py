@@ -1,5 +1,5 @@
 import dlt
-from wow_api_dlt.resources.resources_auctions import fetch_auction_house_items, fetch_ah_commodities
+from wow_api_dlt.resources.resources_auctions import fetch_auction_house_items, fetch_auction_history, fetch_auction_snapshots, fetch_ah_commodities
 from wow_api_dlt.resources.resources_items import fetch_items, fetch_item_details
 from wow_api_dlt.resources.resources_misc import fetch_media_hrfs,fetch_realm_data
 
@@ -7,30 +7,35 @@ from wow_api_dlt.resources.resources_misc import fetch_media_hrfs,fetch_realm_da
 """If you want to use a source specific override for the pipeline you can add a list of resources to pick specific runs.
 accepted values are "auctions", "items" and "realm_data". If no list is provided, it will run all resources."""
 @dlt.source(name="wow_api_data")
-def wow_api_source(optional_source_list=None,test_mode=False):
+def wow_api_source(optional_source_list=None,test_mode=False,full_item_sync=False,retry_failed=False):
     """
     This is the source function that will be used in the pipeline.
     It returns all the resources that we want to run in the pipeline.
+    full_item_sync re-verifies the whole item catalogue instead of only looking for new items.
+    retry_failed only re-fetches what failed in earlier runs (see utilities/dead_letter.py).
     """
     if optional_source_list is not None:
         # If an optional source dictionary is provided, we use it to pick resources
         method_list = []
         if "auctions" in optional_source_list:
-            method_list.append(fetch_auction_house_items(test_mode=test_mode))
+            auctions = fetch_auction_house_items(test_mode=test_mode, retry_failed_only=retry_failed)
+            # New snapshots are forked into the append-only history by two transformers
+            method_list.extend([auctions, auctions | fetch_auction_history, auctions | fetch_auction_snapshots])
         if "commodities" in optional_source_list:
             method_list.append(fetch_ah_commodities())
         if "items" in optional_source_list:
-            method_list.append(fetch_items())
+            method_list.append(fetch_items(full_sync=full_item_sync, retry_failed_only=retry_failed))
         if "realm_data" in optional_source_list:
             method_list.append(fetch_realm_data())
         if "item_details" in optional_source_list:
-            method_list.append(fetch_item_details())
+            method_list.append(fetch_item_details(retry_failed_only=retry_failed))
         if "item_media" in optional_source_list:
-            method_list.append(fetch_media_hrfs())
+            method_list.append(fetch_media_hrfs(retry_failed_only=retry_failed))
         return method_list
     else:
         #return [fetch_item_details()] 
-        return [fetch_media_hrfs(),fetch_ah_commodities(),fetch_auction_house_items(),fetch_items(),fetch_realm_data(),fetch_item_details()] # # For testing purposes, we only run the media fetch resource
+        auctions = fetch_auction_house_items()
+        return [fetch_media_hrfs(),fetch_ah_commodities(),auctions,auctions | fetch_auction_history,auctions | fetch_auction_snapshots,fetch_items(full_sync=full_item_sync),fetch_realm_data(),fetch_item_details()] # # For testing purposes, we only run the media fetch resource
 
 if __name__ == "__main__":
     fetch_item_details()
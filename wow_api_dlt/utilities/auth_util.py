@@ -1,90 +1,203 @@
-from dlt.sources.helpers.rest_client.auth import OAuth2ClientCredentials
-import dlt
-from dlt.sources.helpers.rest_client import RESTClient
-import time
-import sys # Added for print statements in main block
-
-# --- IMPORTANT: Add these imports ---
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-# --- END IMPORTANT IMPORTS ---
-
-# Import the configured blizzard_api_rate_limiter from your rate_limiter module.
-# This variable is now an instance of HourlyBreakRateLimiter.
-from ..rate_limiter import blizzard_api_rate_limiter
-
-BASE_URL = "https://eu.api.blizzard.com"
-
-# --- Create a single, global RESTClient instance ---
-# This client will handle connection pooling internally for all API calls.
-_blizzard_api_client = None
-
-def _initialize_api_client():
-    """
-    Initializes the global RESTClient instance if it hasn't been initialized yet.
-    This ensures that only one client instance is created and reused across all API calls,
-    enabling connection pooling and proper retry logic.
-    """
-    global _blizzard_api_client
-    if _blizzard_api_client is None:
-        client_id = dlt.secrets["wow_api"]["client_id"]
-        client_secret = dlt.secrets["wow_api"]["client_secret"]
-        
-        # 1. Define the retry strategy for the underlying requests.Session
-        _retry_strategy = Retry(
-            total=5,  # Total retries
-            backoff_factor=1, # Exponential backoff (1s, 2s, 4s, etc.)
-            status_forcelist=[429, 500, 502, 503, 504], # HTTP status codes to retry on
-            allowed_methods=["HEAD", "GET", "OPTIONS"], # Which HTTP methods to retry
-            connect=5, # Crucial: retry connection-related errors like WinError 10055
-        )
-        
-        # 2. Create an HTTPAdapter and mount the retry strategy to it
-        _adapter = HTTPAdapter(
-            pool_connections=50, # Number of connections to cache
-            pool_maxsize=100,    # Max connections allowed in the pool
-            max_retries=_retry_strategy # Apply the retry strategy to the adapter
-        )
-        
-        # 3. Create a requests.Session instance and mount the adapter
-        # This session will be passed to the dlt RESTClient
-        _requests_session = requests.Session()
-        _requests_session.mount("http://", _adapter)
-        _requests_session.mount("https://", _adapter)
-        
-        # Set a default timeout for the session
-        _requests_session.timeout = 30 # Default timeout for API requests in seconds
-
-        # 4. Initialize the dlt RESTClient, passing the configured requests.Session
-        _blizzard_api_client = RESTClient(
-            base_url = BASE_URL,
-            auth = OAuth2ClientCredentials(
-                client_id = client_id,
-                client_secret = client_secret,
-                access_token_url = "https://oauth.battle.net/token",
-            ),
-            # Pass the pre-configured requests.Session instance here
-            session=_requests_session 
-        )
-    return _blizzard_api_client
-
-# Initialize the client once when the module is imported.
-_initialize_api_client()
-
-
-def get_api_response(endpoint: str, params: dict = {}):
-    """
-    Makes a request to the Blizzard API and returns the response.
-    This function now uses the globally configured `_blizzard_api_client` instance,
-    which handles connection pooling and retries internally.
-    """
-    # Call the wait_for_token_with_break method from your HourlyBreakRateLimiter instance
-    blizzard_api_rate_limiter.wait_for_token_with_break()  
-
-    # Use the pre-initialized global client
-    response = _blizzard_api_client.get(path=endpoint, params=params)
-    response.raise_for_status() 
-    return response
-
-
+import dlt
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from pathlib import Path
+
+from .fetch_engine import BlizzardFetchEngine, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from .response_cache import ResponseCache
+
+# Import the configured blizzard_api_rate_limiter from your rate_limiter module.
+# This variable is a SlidingWindowRateLimiter that accounts for both the per-second and per-hour quota.
+from ..rate_limiter import blizzard_api_rate_limiter
+
+BASE_URL = "https://eu.api.blizzard.com"
+TOKEN_URL = "https://oauth.battle.net/token"
+
+# Default number of concurrent requests, can be overridden with wow_api.max_in_flight_requests in .dlt/config.toml
+DEFAULT_MAX_IN_FLIGHT_REQUESTS = 32
+# Default number of submitted-but-unconsumed requests in iter_api_responses
+DEFAULT_SUBMISSION_WINDOW = 256
+
+# Static game data (items, media, item classes) only changes with game patches, so those responses
+# are cached on disk. Namespaces missing here (dynamic-eu) always go to the API.
+# Delete the api_cache folder to force a refetch after a patch. Requests that have to see changes made since then pass use_cache=False.
+RESPONSE_CACHE_DIR = Path(__file__).resolve().parents[2] / "wow_api_dbt" / "api_cache"
+RESPONSE_CACHE_TTL_SECONDS = {
+    "static": 7 * 24 * 3600, # One week
+}
+# Size bound of the cache, can be overridden with wow_api.response_cache_max_mb (0 disables the cache)
+DEFAULT_RESPONSE_CACHE_MAX_MB = 2048
+
+# Largest page the search endpoints (/data/wow/search/...) return
+SEARCH_PAGE_SIZE = 1000
+
+# --- Create a single, global fetch engine instance ---
+# The engine owns one async HTTP client with connection pooling and retry logic for all API calls.
+_blizzard_fetch_engine = None
+
+def _initialize_fetch_engine():
+    """
+    Initializes the global BlizzardFetchEngine instance if it hasn't been initialized yet.
+    This ensures that only one engine (and one HTTP connection pool) is created and shared
+    by every resource, so the in-flight limit and the rate limiter apply to all API calls.
+    """
+    global _blizzard_fetch_engine
+    if _blizzard_fetch_engine is None:
+        client_id = dlt.secrets["wow_api"]["client_id"]
+        client_secret = dlt.secrets["wow_api"]["client_secret"]
+        max_in_flight = dlt.config.get("wow_api.max_in_flight_requests", int) or DEFAULT_MAX_IN_FLIGHT_REQUESTS
+
+        _blizzard_fetch_engine = BlizzardFetchEngine(
+            base_url = BASE_URL,
+            client_id = client_id,
+            client_secret = client_secret,
+            token_url = TOKEN_URL,
+            rate_limiter = blizzard_api_rate_limiter,
+            max_in_flight = max_in_flight,
+            timeout = 30, # Default timeout for API requests in seconds
+            max_retries = 5, # Retries on 429/5xx and connection errors
+            backoff_factor = 1, # Exponential backoff (1s, 2s, 4s, etc.)
+        )
+    return _blizzard_fetch_engine
+
+# Initialize the engine once when the module is imported.
+_initialize_fetch_engine()
+
+
+# --- Persistent response cache ---
+_response_cache = None
+# Cache writes run on their own thread so disk I/O never blocks the fetch engine's event loop
+_cache_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-cache-writer")
+
+def _initialize_response_cache():
+    """Creates the global on-disk response cache unless it has been disabled in the config."""
+    global _response_cache
+    if _response_cache is None:
+        max_mb = dlt.config.get("wow_api.response_cache_max_mb", int)
+        if max_mb is None:
+            max_mb = DEFAULT_RESPONSE_CACHE_MAX_MB
+        if max_mb > 0:
+            _response_cache = ResponseCache(RESPONSE_CACHE_DIR, RESPONSE_CACHE_TTL_SECONDS, max_bytes=max_mb * 1024 * 1024)
+    return _response_cache
+
+_initialize_response_cache()
+
+
+def _store_in_cache(endpoint, params, future, ttl=None):
+    """Done-callback that hands successful responses to the cache writer."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    _cache_writer.submit(_response_cache.put, endpoint, params, future.result(), ttl)
+
+
+def submit_api_request(endpoint: str, params: dict = {}, priority: int = PRIORITY_NORMAL, headers: dict = None, cache_ttl: int = None, use_cache: bool = True) -> Future:
+    """
+    Schedules a request on the shared fetch engine and returns a Future with the response.
+    Use this from resources that want many requests in flight at once.
+    `priority` is the traffic class: PRIORITY_HIGH for time-sensitive snapshots,
+    PRIORITY_NORMAL for lookups and PRIORITY_LOW for bulk crawls that should only use leftover budget.
+    Extra `headers` (e.g. If-Modified-Since for conditional requests) are passed through as-is.
+    Requests in a cached namespace are answered from the local response cache when possible.
+    `cache_ttl` (seconds) caches a request outside of the cached namespaces, or overrides their TTL,
+    for slowly changing dynamic documents such as the connected realms.
+    use_cache=False always asks the API and does not store the response, for requests that must see
+    the current data (new item probes, full syncs, refetches of changed items).
+    """
+    params = dict(params)
+    # Conditional requests carry their own freshness logic, so they always go to the API
+    cacheable = use_cache and _response_cache is not None and not headers and (cache_ttl or _response_cache.ttl_seconds(params))
+    if cacheable:
+        cached_response = _response_cache.get(BASE_URL, endpoint, params, ttl=cache_ttl)
+        if cached_response is not None:
+            future = Future()
+            future.set_result(cached_response)
+            return future
+
+    future = _blizzard_fetch_engine.submit(endpoint=endpoint, params=params, priority=priority, headers=headers)
+    if cacheable:
+        future.add_done_callback(lambda done: _store_in_cache(endpoint, params, done, cache_ttl))
+    return future
+
+
+def stream_api_request(endpoint: str, params: dict = {}, priority: int = PRIORITY_NORMAL, headers: dict = None) -> Future:
+    """
+    Schedules a streamed request and returns a Future with a StreamedResponse once the headers arrived.
+    Use it for large payloads (auction snapshots) that should be parsed while the body is still coming in.
+    Streamed responses bypass the local response cache.
+    """
+    return _blizzard_fetch_engine.stream(endpoint=endpoint, params=dict(params), priority=priority, headers=headers)
+
+
+def get_api_response(endpoint: str, params: dict = {}, priority: int = PRIORITY_NORMAL):
+    """
+    Makes a request to the Blizzard API and returns the response.
+    This is a blocking wrapper around the shared fetch engine, which handles
+    rate limiting, prioritisation, connection pooling and retries internally.
+    """
+    response = submit_api_request(endpoint=endpoint, params=params, priority=priority).result()
+    response.raise_for_status()
+    return response
+
+
+def iter_api_responses(requests, priority: int = PRIORITY_NORMAL, window: int = DEFAULT_SUBMISSION_WINDOW, stream: bool = False, cache_ttl: int = None, use_cache: bool = True):
+    """
+    Submits (key, endpoint, params) or (key, endpoint, params, headers) tuples from `requests`
+    and yields (key, future) as they complete.
+    At most `window` requests are submitted and not yet consumed at any time. The next request is
+    only pulled from `requests` when the caller has consumed a result, so a slow consumer slows the
+    submissions down (backpressure) and memory stays flat however many requests there are.
+    With stream=True the futures hold StreamedResponses, which the caller must close.
+    `cache_ttl` and `use_cache` are passed on to submit_api_request, streamed requests are never cached.
+    """
+    submit = stream_api_request if stream else partial(submit_api_request, cache_ttl=cache_ttl, use_cache=use_cache)
+    requests = iter(requests)
+    pending = {}
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    key, endpoint, params, *headers = next(requests)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[submit(endpoint=endpoint, params=params, priority=priority, headers=headers[0] if headers else None)] = key
+
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+    finally:
+        if stream:
+            # The consumer stopped early (generator closed or an exception), close the streams it never got,
+            # each one holds a connection and one of the engine's in-flight slots until it is closed
+            for future in pending:
+                future.add_done_callback(_close_abandoned_stream)
+
+
+def _close_abandoned_stream(future):
+    """Done-callback that closes the StreamedResponse of a stream request nobody is going to read."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    future.result().close(wait=False) # May run on the engine's loop thread, so never block on it
+
+
+def iter_search_pages(endpoint: str, params: dict = {}, priority: int = PRIORITY_NORMAL, page_size: int = SEARCH_PAGE_SIZE, cache_ttl: int = None, use_cache: bool = True):
+    """
+    Pages through a search endpoint and yields (page_num, future) as the pages complete.
+    The first page is requested alone to learn the page count, then every remaining page is
+    requested at once. When the first page fails its future is the only one yielded.
+    """
+    params = {**params, "_pageSize": page_size}
+    first_page = submit_api_request(endpoint=endpoint, params={**params, "_page": 1}, priority=priority, cache_ttl=cache_ttl, use_cache=use_cache)
+    yield 1, first_page
+    try:
+        response = first_page.result()
+        response.raise_for_status()
+        page_count = response.json().get("pageCount", 1)
+    except Exception:
+        return
+    page_requests = ((page_num, endpoint, {**params, "_page": page_num}) for page_num in range(2, page_count + 1))
+    yield from iter_api_responses(page_requests, priority=priority, cache_ttl=cache_ttl, use_cache=use_cache)
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from dlt.destinations.exceptions import DatabaseUndefinedRelation
+
+# Raw commodity snapshots younger than this (counted back from the newest loaded snapshot) are kept as they are.
+# Older snapshots are folded into one row per item and snapshot in COMMODITY_AGGREGATES_TABLE.
+COMMODITY_RAW_RETENTION = timedelta(days=2)
+
+COMMODITY_AGGREGATES_TABLE = "commodity_aggregates"
+
+
+def compact_commodities(pipeline, retention=COMMODITY_RAW_RETENTION):
+    """
+    Folds the commodity snapshots older than `retention` into per-item aggregates and deletes their raw rows.
+
+    A region-wide snapshot holds hundreds of thousands of auctions but only tens of thousands of items,
+    so the raw table stays a couple of days deep and the history grows by one row per item and snapshot.
+    The aggregates are written and the raw rows deleted in one transaction, an interrupted compaction
+    leaves both tables as they were. Returns the number of snapshots that were compacted.
+    """
+    with pipeline.sql_client() as client:
+        commodities = client.make_qualified_table_name("commodities")
+        aggregates = client.make_qualified_table_name(COMMODITY_AGGREGATES_TABLE)
+        try:
+            newest = client.execute_sql(f"SELECT max(timestamp) FROM {commodities}")[0][0]
+        except DatabaseUndefinedRelation:
+            return 0 # Commodities were never loaded into this dataset
+        if newest is None:
+            return 0
+        cutoff = newest - retention
+
+        client.execute_sql(f"""
+            CREATE TABLE IF NOT EXISTS {aggregates} (
+                timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+                item__id BIGINT NOT NULL,
+                auction_count BIGINT,
+                quantity BIGINT,
+                min_unit_price BIGINT,
+                max_unit_price BIGINT,
+                avg_unit_price DOUBLE, -- Weighted by quantity
+                PRIMARY KEY (timestamp, item__id)
+            )""")
+        with client.begin_transaction():
+            snapshots = client.execute_sql(f"SELECT count(DISTINCT timestamp) FROM {commodities} WHERE timestamp < %s", cutoff)[0][0]
+            if snapshots:
+                client.execute_sql(f"""
+                    INSERT OR REPLACE INTO {aggregates}
+                    SELECT
+                        timestamp,
+                        item__id,
+                        count(*),
+                        sum(quantity),
+                        min(unit_price),
+                        max(unit_price),
+                        sum(unit_price * quantity) / nullif(sum(quantity), 0)
+                    FROM {commodities}
+                    WHERE timestamp < %s
+                    GROUP BY timestamp, item__id""", cutoff)
+                client.execute_sql(f"DELETE FROM {commodities} WHERE timestamp < %s", cutoff)
+    if snapshots:
+        print(f"Compacted {snapshots} commodity snapshots older than {cutoff:%Y-%m-%d %H:%M} into {COMMODITY_AGGREGATES_TABLE}.")
+    return snapshots
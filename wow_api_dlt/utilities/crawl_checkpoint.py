@@ -0,0 +1,92 @@
+import json
+import os
+import time
+import uuid
+import zlib
+from pathlib import Path
+
+from .sqlite_util import LazySQLiteConnection
+
+# Checkpoints of long running crawls, one SQLite file per crawl. dlt interleaves the resources of a run
+# on one thread, so crawls sharing a file would block each other's open write transactions.
+CRAWL_CHECKPOINT_DIR = Path(__file__).resolve().parents[2] / "wow_api_dbt" / "crawl_checkpoints"
+
+# Records are committed in batches, a crash loses at most this many fetched records
+COMMIT_EVERY_RECORDS = 200
+
+
+class CrawlCheckpoint:
+    """
+    Local spool of the records a long crawl has already fetched, so an interrupted crawl can resume.
+
+    dlt discards everything a resource yielded when the extraction is interrupted, so the progress has to
+    live outside of the pipeline. Every fetched record is written to the crawl's SQLite file.
+    On the next run `begin` decides what to do with it: if the id of the spooled crawl matches the
+    completed crawl id the resource stored in the dlt state, the crawl finished and was extracted,
+    and the spool is dropped. Otherwise the crawl was interrupted, its records are replayed with `records()`
+    and only the keys missing from `done_keys()` have to be fetched again.
+    Store `crawl_id` in the dlt state once the crawl has yielded everything. Use the source state for
+    replace resources, dlt resets their resource state at the start of every run.
+    """
+
+    def __init__(self, name, checkpoint_dir=CRAWL_CHECKPOINT_DIR):
+        self.name = name
+        self.db_path = os.path.join(str(checkpoint_dir), f"{name}.sqlite")
+        self.crawl_id = None
+        self._db = LazySQLiteConnection(self.db_path, self._create_tables)
+        self._uncommitted = 0
+
+    @staticmethod
+    def _create_tables(conn):
+        conn.execute("CREATE TABLE IF NOT EXISTS crawls (name TEXT PRIMARY KEY, crawl_id TEXT NOT NULL, started_at REAL NOT NULL)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                name TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload BLOB,
+                PRIMARY KEY (name, key)
+            )""")
+
+    def begin(self, completed_crawl_id):
+        """
+        Starts a new crawl, or resumes the spooled one if it never completed.
+        Returns True when resuming.
+        """
+        conn = self._db.connection()
+        row = conn.execute("SELECT crawl_id FROM crawls WHERE name = ?", (self.name,)).fetchone()
+        if row is not None and row[0] != completed_crawl_id:
+            self.crawl_id = row[0]
+            return True
+
+        self.crawl_id = uuid.uuid4().hex
+        conn.execute("DELETE FROM records WHERE name = ?", (self.name,))
+        conn.execute("INSERT OR REPLACE INTO crawls VALUES (?, ?, ?)", (self.name, self.crawl_id, time.time()))
+        conn.commit()
+        return False
+
+    def done_keys(self):
+        """Keys of every record spooled by the current crawl."""
+        return {key for (key,) in self._db.connection().execute("SELECT key FROM records WHERE name = ?", (self.name,))}
+
+    def records(self):
+        """Yields (key, payload) for the spooled records, payload is None for keys that produced no record."""
+        cursor = self._db.connection().cursor()
+        for key, payload in cursor.execute("SELECT key, payload FROM records WHERE name = ?", (self.name,)):
+            yield key, None if payload is None else json.loads(zlib.decompress(payload))
+
+    def record(self, key, payload=None):
+        """Spools a fetched record. Use payload=None to mark a key as done without a record."""
+        stored = None if payload is None else zlib.compress(json.dumps(payload).encode(), 6)
+        self._db.connection().execute("INSERT OR REPLACE INTO records VALUES (?, ?, ?)", (self.name, str(key), stored))
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY_RECORDS:
+            self.flush()
+
+    def flush(self):
+        if self._db.is_open() and self._uncommitted:
+            self._db.connection().commit()
+            self._uncommitted = 0
+
+    def close(self):
+        self.flush()
+        self._db.close()
@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+from .sqlite_util import LazySQLiteConnection
+
+DEAD_LETTER_DB_PATH = Path(__file__).resolve().parents[2] / "wow_api_dbt" / "dead_letters.sqlite"
+
+
+class DeadLetterStore:
+    """
+    Local table of API fetches that failed, so they can be re-driven later instead of re-running a whole crawl.
+
+    Resources `record` a failure with the key of the unit that failed (an item ID, a realm ID, a search page),
+    the endpoint, params and error, and `resolve` the key once it has been fetched successfully.
+    A key that keeps failing is stored once, with the number of attempts and its latest error.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.lock = threading.Lock()
+        self._db = LazySQLiteConnection(self.db_path, self._create_table)
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                resource TEXT NOT NULL,
+                key TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                params TEXT NOT NULL,
+                error TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                first_failed_at REAL NOT NULL,
+                last_failed_at REAL NOT NULL,
+                PRIMARY KEY (resource, key)
+            )""")
+
+    def record(self, resource, key, endpoint, params, error):
+        """Stores a failed fetch, or bumps the attempts of a key that failed before."""
+        now = time.time()
+        with self.lock:
+            conn = self._db.connection()
+            conn.execute(
+                """
+                INSERT INTO dead_letters VALUES (?, ?, ?, ?, ?, 1, ?, ?)
+                ON CONFLICT (resource, key) DO UPDATE SET
+                    endpoint = excluded.endpoint,
+                    params = excluded.params,
+                    error = excluded.error,
+                    attempts = attempts + 1,
+                    last_failed_at = excluded.last_failed_at
+                """,
+                (resource, str(key), endpoint, json.dumps(params, default=str), str(error), now, now),
+            )
+            conn.commit()
+
+    def resolve(self, resource, key):
+        """Removes a key that has now been fetched successfully."""
+        with self.lock:
+            conn = self._db.connection()
+            conn.execute("DELETE FROM dead_letters WHERE resource = ? AND key = ?", (resource, str(key)))
+            conn.commit()
+
+    def pending(self, resource):
+        """Returns {key: (endpoint, params, attempts, error)} of the failed fetches of a resource."""
+        with self.lock:
+            rows = self._db.connection().execute(
+                "SELECT key, endpoint, params, attempts, error FROM dead_letters WHERE resource = ?", (resource,)
+            ).fetchall()
+        return {key: (endpoint, json.loads(params), attempts, error) for key, endpoint, params, attempts, error in rows}
+
+
+# --- Global dead-letter store shared by all resources ---
+dead_letter_store = DeadLetterStore(DEAD_LETTER_DB_PATH)
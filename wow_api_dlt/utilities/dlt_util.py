@@ -1,10 +1,73 @@
 from wow_api_dlt.utilities import  auth_util
 import sys
+import threading
+import time
+from concurrent.futures import Future
+from functools import wraps
+
+# Schema contract of every resource. Tables declare the columns the dbt models use (columns= and nested_hints=),
+# values of undeclared columns are dropped and a value that does not fit its declared type fails the load
+# instead of creating a variant column. dlt lets a brand new table evolve once, so the contract applies
+# from the second load of a table on.
+FROZEN_SCHEMA_CONTRACT = {"tables": "evolve", "columns": "discard_value", "data_type": "freeze"}
+
+def declare_columns(**data_types):
+    """
+    Builds a dlt column hint from column_name="data type" keywords, e.g. declare_columns(id="bigint", url="text").
+    """
+    return {name: {"name": name, "data_type": data_type} for name, data_type in data_types.items()}
+
+# --- Lookup cache ---
+# Small reference lookups (realm index, item classes) are needed by several resources of the same run
+# and hardly ever change, so their results are kept in memory for a while
+REALM_IDS_TTL_SECONDS = 3600
+ITEM_CLASSES_TTL_SECONDS = 24 * 3600
+
+_lookup_lock = threading.Lock()
+
+def cached_lookup(ttl_seconds):
+    """
+    Memoizes a lookup function per arguments for `ttl_seconds` after it returned.
+    Single flight: callers that arrive while the lookup is running wait for that call instead of
+    starting their own request. A failed lookup is not cached, the next caller tries again.
+    The result is shared between callers, so it must not be modified.
+    Call `.cache_clear()` on the decorated function to force a refetch.
+    """
+    def decorator(func):
+        entries = {} # args -> [future, expires_at], expires_at is None while the lookup is in flight
+
+        @wraps(func)
+        def wrapper(*args):
+            with _lookup_lock:
+                entry = entries.get(args)
+                owner = entry is None or (entry[1] is not None and entry[1] < time.monotonic())
+                if owner:
+                    entry = entries[args] = [Future(), None]
+            future = entry[0]
+            if owner:
+                try:
+                    future.set_result(func(*args))
+                    entry[1] = time.monotonic() + ttl_seconds
+                except BaseException as e:
+                    with _lookup_lock:
+                        entries.pop(args, None)
+                    future.set_exception(e)
+            return future.result()
+
+        def cache_clear():
+            with _lookup_lock:
+                entries.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    return decorator
 
 # Fetch and bring all the connected realm IDs, returns a list of IDs
+@cached_lookup(REALM_IDS_TTL_SECONDS)
 def fetch_realm_ids():
     """
-    Fetches all the connected realm ids and cut out the id from the url. THIS IS ONLY NECESARY LIKE ONES?? 
+    Fetches all the connected realm ids and cut out the id from the url.
+    Cached for REALM_IDS_TTL_SECONDS, the resources of one run share a single request.
     """
     endpoint = "/data/wow/connected-realm/index"
     params = {
@@ -13,10 +76,11 @@ def fetch_realm_ids():
     response = auth_util.get_api_response(endpoint=endpoint, params=params)
     connected_realm_list = response.json()["connected_realms"]
     
-    list_of_realm_ids = [x["href"].split("/")[-1].split("?")[0] for x in connected_realm_list]
+    list_of_realm_ids = tuple(x["href"].split("/")[-1].split("?")[0] for x in connected_realm_list)
     return list_of_realm_ids  
 
 # Returns a list of indexes for item classes
+@cached_lookup(ITEM_CLASSES_TTL_SECONDS)
 def fetch_item_classes(): 
     endpoint = "/data/wow/item-class/index"
     params = {
@@ -33,20 +97,24 @@ def fetch_item_classes():
     return item_class_dict
 
 # Returns a dictionary of indexes for item subclasses
+@cached_lookup(ITEM_CLASSES_TTL_SECONDS)
 def fetch_item_class_and_subclasses():
-    item_class_dict = fetch_item_classes()
-    
-
-    for item_class_id,value in item_class_dict.items():
-        endpoint = f"/data/wow/item-class/{item_class_id}"
-        params = {
-            "namespace": "static-eu",
-            "region": "eu"
-        }
+    """
+    Item classes with the IDs of their subclasses. The classes are requested all at once
+    through the shared fetch engine instead of one after another.
+    """
+    item_class_dict = {item_class_id: dict(value) for item_class_id, value in fetch_item_classes().items()}
+    class_requests = (
+        (item_class_id, f"/data/wow/item-class/{item_class_id}", {"namespace": "static-eu", "region": "eu"})
+        for item_class_id in item_class_dict
+    )
 
-        response = auth_util.get_api_response(endpoint=endpoint, params=params)
+    for item_class_id, future in auth_util.iter_api_responses(class_requests):
+        response = future.result()
+        response.raise_for_status()
         data = response.json()
 
+        value = item_class_dict[item_class_id]
         subclass_ids = [subclass["id"] for subclass in data.get("item_subclasses", [])]
         value["subclass_ids"] = subclass_ids
 
@@ -0,0 +1,382 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import httpx
+
+# HTTP status codes that are retried with exponential backoff (same set the old urllib3 Retry used)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Traffic classes for the request scheduler
+PRIORITY_HIGH = 0   # Time-sensitive snapshots (auctions, commodities)
+PRIORITY_NORMAL = 1 # Small lookups and metadata (realm index, item classes, realm data)
+PRIORITY_LOW = 2    # Multi-hour bulk crawls (items, item details, item media)
+
+# Share of the request slots each class gets when every class has requests waiting.
+# With these weights a bulk crawl only gets about 1% of the budget while a snapshot is running,
+# and all of it when nothing else is waiting.
+PRIORITY_WEIGHTS = {PRIORITY_HIGH: 100, PRIORITY_NORMAL: 10, PRIORITY_LOW: 1}
+
+# Pause of the dispatcher after the rate limiter failed (e.g. its SQLite quota store was locked), before it tries again
+DISPATCH_ERROR_BACKOFF_SECONDS = 1.0
+
+
+class BlizzardFetchEngine:
+    """
+    Shared asyncio-based HTTP client for the Blizzard API.
+
+    A single event loop runs in a background thread and owns one httpx.AsyncClient.
+    Synchronous code (dlt resources) submits requests with `submit()` and gets a
+    concurrent.futures.Future back, so many requests can be in flight without
+    holding one thread per request. The number of concurrent requests is capped
+    by `max_in_flight`, and every request draws a token from the rate limiter
+    before it is sent.
+
+    Requests carry a traffic class. A dispatcher coroutine hands out rate limiter
+    tokens and in-flight slots one at a time, choosing among the waiting classes by
+    smooth weighted round robin (PRIORITY_WEIGHTS), so high-priority requests are
+    served first and bulk crawls run on the leftover budget.
+    """
+
+    def __init__(self, base_url, client_id, client_secret, token_url, rate_limiter,
+                 max_in_flight=32, timeout=30.0, max_retries=5, backoff_factor=1.0):
+        if max_in_flight <= 0:
+            raise ValueError("max_in_flight must be positive.")
+
+        self.base_url = base_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url
+        self.rate_limiter = rate_limiter
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._semaphore = None
+        self._token_lock = None
+        self._waiting = None
+        self._waiting_event = None
+        self._priority_credit = None
+        self._dispatcher = None
+        self._dispatcher_error = None
+        self._access_token = None
+        self._token_expires_at = 0.0
+        self._start_lock = threading.Lock()
+
+    # --- Event loop lifecycle ---
+
+    def _ensure_started(self):
+        """Starts the background event loop on first use."""
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run_loop, name="blizzard-fetch-engine", daemon=True)
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self._setup(), self._loop).result()
+        return self._loop
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _setup(self):
+        # The client, semaphore and lock must be created inside the loop that uses them
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._token_lock = asyncio.Lock()
+        self._waiting = {priority: deque() for priority in PRIORITY_WEIGHTS}
+        self._waiting_event = asyncio.Event()
+        self._priority_credit = {priority: 0 for priority in PRIORITY_WEIGHTS}
+        self._dispatcher_error = None
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._dispatcher.add_done_callback(self._dispatcher_done)
+
+    async def _shutdown(self):
+        self._dispatcher.cancel()
+        await self._client.aclose()
+
+    def close(self):
+        """Closes the HTTP client and stops the background event loop."""
+        with self._start_lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+    # --- Authentication ---
+
+    async def _get_access_token(self, force_refresh=False):
+        """Returns a cached OAuth client-credentials token, fetching a new one when it is about to expire."""
+        async with self._token_lock:
+            if force_refresh or self._access_token is None or time.monotonic() >= self._token_expires_at:
+                response = await self._client.post(
+                    self.token_url,
+                    data={"grant_type": "client_credentials"},
+                    auth=(self.client_id, self.client_secret),
+                )
+                response.raise_for_status()
+                payload = response.json()
+                self._access_token = payload["access_token"]
+                # Refresh a minute early so in-flight requests never carry an expired token
+                self._token_expires_at = time.monotonic() + payload.get("expires_in", 3600) - 60
+            return self._access_token
+
+    # --- Requests ---
+
+    def _backoff_seconds(self, attempt, response=None):
+        """Exponential backoff (1s, 2s, 4s, ...) that honours a Retry-After header when present."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None:
+                try:
+                    return max(0.0, float(retry_after))
+                except ValueError:
+                    pass
+        return self.backoff_factor * (2 ** attempt)
+
+    # --- Scheduling ---
+
+    def _next_priority(self):
+        """Smooth weighted round robin over the traffic classes that have requests waiting."""
+        ready = [priority for priority, waiting in self._waiting.items() if waiting]
+        if not ready:
+            return None
+        for priority in self._priority_credit:
+            if priority in ready:
+                self._priority_credit[priority] += PRIORITY_WEIGHTS[priority]
+            else:
+                self._priority_credit[priority] = 0 # Idle classes do not build up credit
+        chosen = max(ready, key=lambda priority: (self._priority_credit[priority], -priority))
+        self._priority_credit[chosen] -= sum(PRIORITY_WEIGHTS[priority] for priority in ready)
+        return chosen
+
+    def _grant_next_turn(self, error=None):
+        """
+        Resolves the turn of the next waiting request, or fails it with `error`.
+        Returns False when no request was waiting anymore.
+        """
+        while True:
+            priority = self._next_priority()
+            if priority is None:
+                return False
+            turn = self._waiting[priority].popleft()
+            if not turn.done(): # Skip callers that were cancelled while waiting
+                if error is None:
+                    turn.set_result(None)
+                else:
+                    turn.set_exception(error)
+                return True
+
+    async def _dispatch(self):
+        """Grants waiting requests an in-flight slot and a rate limiter token, one at a time."""
+        while True:
+            while not any(self._waiting.values()):
+                self._waiting_event.clear()
+                await self._waiting_event.wait()
+
+            await self._semaphore.acquire()
+            try:
+                # The limiter reserves a time slot and we await it, so the loop stays free for in-flight requests
+                await self.rate_limiter.wait_for_token_async()
+            except Exception as e:
+                # The limiter failed (e.g. its quota store is locked or the disk is full). Give the slot back,
+                # fail the request whose turn it was with the error and keep dispatching after a pause.
+                self._semaphore.release()
+                self._grant_next_turn(e)
+                await asyncio.sleep(DISPATCH_ERROR_BACKOFF_SECONDS)
+                continue
+
+            # The class is chosen after the wait, so requests that arrived meanwhile compete for this token
+            if not self._grant_next_turn():
+                self._semaphore.release()
+
+    def _dispatcher_done(self, task):
+        """
+        Reports a dispatcher that stopped for any reason other than shutdown, and fails every waiting
+        and later request with its error instead of leaving their Futures unresolved forever.
+        """
+        if task.cancelled():
+            return
+        error = task.exception() or RuntimeError("The fetch engine dispatcher stopped.")
+        self._dispatcher_error = error
+        sys.stderr.write(f"\nFetch engine dispatcher stopped: {error!r}\n")
+        sys.stderr.flush()
+        for waiting in self._waiting.values():
+            while waiting:
+                turn = waiting.popleft()
+                if not turn.done():
+                    turn.set_exception(error)
+
+    async def _wait_for_turn(self, priority):
+        """Queues the request in its traffic class until the dispatcher grants it a slot."""
+        if self._dispatcher_error is not None:
+            raise RuntimeError("The fetch engine dispatcher stopped.") from self._dispatcher_error
+        turn = self._loop.create_future()
+        self._waiting[priority].append(turn)
+        self._waiting_event.set()
+        try:
+            await turn
+        except asyncio.CancelledError:
+            if turn.done() and not turn.cancelled():
+                self._semaphore.release() # The slot was granted but will never be used
+            raise
+
+    async def _send_once(self, endpoint, params, headers, priority, stream=False):
+        """
+        Sends one attempt. The in-flight slot is only held while the request is on the wire, not during backoff.
+        With stream=True only the headers are read, and the slot stays taken until `_close_stream` is called.
+        """
+        await self._wait_for_turn(priority)
+        release_slot = True
+        try:
+            token = await self._get_access_token()
+            sent_at = time.monotonic()
+            request = self._client.build_request(
+                "GET",
+                endpoint,
+                params=params,
+                headers={**headers, "Authorization": f"Bearer {token}"},
+            )
+            response = await self._client.send(request, stream=stream)
+            # Let the limiter adapt its pace to 429s, quota headers and latency
+            self.rate_limiter.observe_response(response.status_code, response.headers, time.monotonic() - sent_at)
+            release_slot = not stream
+            return response
+        finally:
+            if release_slot:
+                self._semaphore.release()
+
+    async def _close_stream(self, response):
+        """Closes a streamed response and gives its in-flight slot back."""
+        try:
+            await response.aclose()
+        finally:
+            self._semaphore.release()
+
+    async def _fetch(self, endpoint, params, headers, priority, stream=False):
+        attempt = 0
+        while True:
+            try:
+                response = await self._send_once(endpoint, params, headers, priority, stream)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff_seconds(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 401 and attempt < self.max_retries:
+                # Token was revoked or expired early, get a fresh one and try again
+                if stream:
+                    await self._close_stream(response)
+                await self._get_access_token(force_refresh=True)
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                if stream:
+                    await self._close_stream(response)
+                await asyncio.sleep(self._backoff_seconds(attempt, response))
+                attempt += 1
+                continue
+
+            return response
+
+    async def _open_stream(self, endpoint, params, headers, priority):
+        return StreamedResponse(self, await self._fetch(endpoint, params, headers, priority, stream=True))
+
+    def submit(self, endpoint: str, params: dict = None, priority: int = PRIORITY_NORMAL, headers: dict = None) -> Future:
+        """
+        Schedules a GET request in the given traffic class and returns a concurrent.futures.Future
+        resolving to an httpx.Response. The response is returned as-is, callers decide whether to
+        call raise_for_status() (a conditional request may legitimately come back as 304).
+        Extra `headers`, e.g. If-Modified-Since, are sent along with the Authorization header.
+        """
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Unknown priority {priority}, use one of PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW.")
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._fetch(endpoint, dict(params or {}), dict(headers or {}), priority), loop)
+
+    def stream(self, endpoint: str, params: dict = None, priority: int = PRIORITY_NORMAL, headers: dict = None) -> Future:
+        """
+        Like `submit`, but the Future resolves to a StreamedResponse as soon as the response headers
+        have arrived. The body is read chunk by chunk while the caller iterates over it, so large
+        payloads never have to sit in memory as a whole. The request keeps its in-flight slot until
+        the StreamedResponse is closed.
+        """
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Unknown priority {priority}, use one of PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW.")
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._open_stream(endpoint, dict(params or {}), dict(headers or {}), priority), loop)
+
+
+async def _next_chunk(chunks):
+    return await chunks.__anext__()
+
+
+class StreamedResponse:
+    """
+    Synchronous handle on a streamed httpx.Response that lives on the engine's event loop.
+    `iter_bytes()` pulls one chunk at a time from the loop, so reading is paced by the consumer.
+    Use it as a context manager, or call `close()`, to release the connection and the in-flight slot.
+    """
+
+    def __init__(self, engine, response):
+        self._engine = engine
+        self._response = response
+        self._closed = False
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.request = response.request
+
+    def raise_for_status(self):
+        if not self._response.is_success:
+            self.close()
+        self._response.raise_for_status()
+        return self
+
+    def iter_bytes(self, chunk_size=64 * 1024):
+        """Yields the body in chunks, closing the response once it has been read."""
+        chunks = self._response.aiter_bytes(chunk_size)
+        try:
+            while True:
+                try:
+                    chunk = asyncio.run_coroutine_threadsafe(_next_chunk(chunks), self._engine._loop).result()
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self, wait=True):
+        """
+        Releases the connection and the in-flight slot. With wait=False the close is only scheduled on the
+        engine's loop, which is safe from callbacks that run on the loop thread itself.
+        """
+        if not self._closed:
+            self._closed = True
+            closing = asyncio.run_coroutine_threadsafe(self._engine._close_stream(self._response), self._engine._loop)
+            if wait:
+                closing.result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
@@ -0,0 +1,63 @@
+from dlt.common.normalizers.naming.snake_case import NamingConvention
+
+# Same identifier normalisation dlt applies to the keys of a record ("en_US" -> "en_us")
+_naming = NamingConvention()
+
+
+class FieldProjection:
+    """
+    Strips an API record down to the fields that end up in the loaded tables, before it reaches dlt.
+
+    Fields are given as the flattened column names dlt would generate ("preview_item__binding__name__en_us").
+    A column of a nested table is named by the path of the list followed by the column
+    ("preview_item__stats__value"), lists are walked through and every element is projected.
+    Nested objects and lists that no field points into are dropped, so dlt never normalizes them.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._tree = {}
+        for field in self.fields:
+            node = self._tree
+            *parents, leaf = field.split("__")
+            for segment in parents:
+                child = node.get(segment)
+                if child is True: # A parent was declared as a whole column, keep all of it
+                    break
+                node = node.setdefault(segment, {})
+            else:
+                node[leaf] = True
+        self._key_names = {}
+
+    @classmethod
+    def from_column_hints(cls, columns, nested_hints=None):
+        """Projection onto the declared columns of a resource and of its nested tables."""
+        fields = list(columns)
+        for path, hints in (nested_hints or {}).items():
+            fields += [f"{path}__{name}" for name in hints["columns"]]
+        return cls(fields)
+
+    def _key_name(self, key):
+        name = self._key_names.get(key)
+        if name is None:
+            name = self._key_names[key] = _naming.normalize_identifier(key)
+        return name
+
+    def _project(self, value, node):
+        if node is True:
+            return value
+        if isinstance(value, dict):
+            projected = {}
+            for key, child_value in value.items():
+                child = node.get(self._key_name(key))
+                if child is not None:
+                    projected[key] = self._project(child_value, child)
+            return projected
+        if isinstance(value, list):
+            return [self._project(element, node) for element in value]
+        # A scalar where the fields expected an object, leave it to the schema contract
+        return value
+
+    def apply(self, record):
+        """Returns a projected copy of `record`."""
+        return self._project(record, self._tree)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+
+import httpx
+
+from .sqlite_util import LazySQLiteConnection
+
+# Response headers worth keeping with a cached body
+CACHED_HEADERS = ("Content-Type", "Last-Modified", "ETag")
+
+
+class ResponseCache:
+    """
+    Persistent, size-bounded cache of successful API responses on local disk.
+
+    Bodies are stored content-addressed: each one is zlib-compressed into objects/<sha256 of body>,
+    so identical payloads are only stored once. A small SQLite index maps a request
+    (endpoint + sorted params) to its body, the kept headers and when it was stored.
+    Entries expire after the TTL of their namespace ("static" for static-eu, etc.), and
+    namespaces without a TTL are never cached unless the caller passes a TTL for the request. When the objects grow past `max_bytes`
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir, ttl_seconds_by_namespace, max_bytes):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive.")
+
+        self.cache_dir = str(cache_dir)
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        self.ttl_seconds_by_namespace = dict(ttl_seconds_by_namespace)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._db = LazySQLiteConnection(os.path.join(self.cache_dir, "index.sqlite"), self._create_index)
+        self._total_bytes = 0
+
+    # --- Storage ---
+
+    def _create_index(self, conn):
+        os.makedirs(self.objects_dir, exist_ok=True)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                request_key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                headers TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_content_hash ON entries (content_hash)")
+        conn.execute("CREATE TABLE IF NOT EXISTS blobs (content_hash TEXT PRIMARY KEY, size INTEGER NOT NULL)")
+        self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def _object_path(self, content_hash):
+        return os.path.join(self.objects_dir, content_hash[:2], content_hash)
+
+    @staticmethod
+    def _namespace(params):
+        """'static-eu' -> 'static', 'dynamic-eu' -> 'dynamic'."""
+        return str(params.get("namespace", "")).split("-")[0]
+
+    @staticmethod
+    def _request_key(endpoint, params):
+        canonical = endpoint + "?" + urlencode(sorted((str(key), str(value)) for key, value in params.items()))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def ttl_seconds(self, params):
+        """TTL for the request's namespace, None when the namespace is not cached."""
+        return self.ttl_seconds_by_namespace.get(self._namespace(params))
+
+    # --- Public API ---
+
+    def get(self, base_url, endpoint, params, ttl=None):
+        """Returns a fresh cached httpx.Response for the request, or None on a miss. `ttl` overrides the namespace TTL."""
+        ttl = ttl or self.ttl_seconds(params)
+        if not ttl:
+            return None
+        request_key = self._request_key(endpoint, params)
+        now = time.time()
+        with self.lock:
+            conn = self._db.connection()
+            row = conn.execute("SELECT content_hash, headers, stored_at FROM entries WHERE request_key = ?", (request_key,)).fetchone()
+            if row is None or row[2] + ttl < now:
+                return None
+            content_hash, headers, _ = row
+            try:
+                with open(self._object_path(content_hash), "rb") as file:
+                    body = zlib.decompress(file.read())
+            except (OSError, zlib.error):
+                # Object vanished or is corrupt, forget the entry so it gets fetched again
+                conn.execute("DELETE FROM entries WHERE request_key = ?", (request_key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE request_key = ?", (now, request_key))
+            conn.commit()
+
+        request = httpx.Request("GET", base_url + endpoint, params=params)
+        return httpx.Response(200, headers={**json.loads(headers), "X-Local-Cache": "hit"}, content=body, request=request)
+
+    def put(self, endpoint, params, response, ttl=None):
+        """Stores a successful response if its namespace is cacheable or a `ttl` is given for it."""
+        if response.status_code != 200 or not (ttl or self.ttl_seconds(params)):
+            return
+        body = response.content
+        content_hash = hashlib.sha256(body).hexdigest()
+        headers = json.dumps({key: response.headers[key] for key in CACHED_HEADERS if key in response.headers})
+        now = time.time()
+        with self.lock:
+            conn = self._db.connection()
+            if conn.execute("SELECT 1 FROM blobs WHERE content_hash = ?", (content_hash,)).fetchone() is None:
+                object_path = self._object_path(content_hash)
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                compressed = zlib.compress(body, 6)
+                # Write to a temp file first so a crash never leaves a truncated object behind
+                temp_path = f"{object_path}.{os.getpid()}.tmp"
+                with open(temp_path, "wb") as file:
+                    file.write(compressed)
+                os.replace(temp_path, object_path)
+                conn.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?)", (content_hash, len(compressed)))
+                self._total_bytes += len(compressed)
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (self._request_key(endpoint, params), self._namespace(params), content_hash, headers, now, now),
+            )
+            conn.commit()
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        """Drops least recently used entries until the objects are below 90% of max_bytes. Called under the lock."""
+        target_bytes = int(self.max_bytes * 0.9)
+        while self._total_bytes > target_bytes:
+            oldest = conn.execute("SELECT request_key FROM entries ORDER BY last_access LIMIT 100").fetchall()
+            if not oldest:
+                break
+            conn.executemany("DELETE FROM entries WHERE request_key = ?", oldest)
+            orphans = conn.execute(
+                "SELECT content_hash, size FROM blobs WHERE content_hash NOT IN (SELECT content_hash FROM entries)"
+            ).fetchall()
+            for content_hash, size in orphans:
+                try:
+                    os.remove(self._object_path(content_hash))
+                except OSError:
+                    pass
+                self._total_bytes -= size
+            conn.executemany("DELETE FROM blobs WHERE content_hash = ?", [(content_hash,) for content_hash, _ in orphans])
+            conn.commit()
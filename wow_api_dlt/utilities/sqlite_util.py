@@ -0,0 +1,42 @@
+import os
+import sqlite3
+
+
+class LazySQLiteConnection:
+    """
+    SQLite connection to one local database file, opened on first use.
+
+    The connection is opened again after a fork, since SQLite connections must not cross processes.
+    Every connection runs in WAL mode with synchronous=NORMAL, so readers in other processes do not block
+    the writer. `setup` is called with each new connection to create the owner's tables.
+    Threads may share the connection, the owner serialises access to it.
+    """
+
+    def __init__(self, db_path, setup, isolation_level=""):
+        self.db_path = str(db_path)
+        self.setup = setup
+        self.isolation_level = isolation_level # None puts the connection in autocommit mode
+        self._conn = None
+        self._conn_pid = None
+
+    def connection(self):
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=self.isolation_level, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.setup(conn)
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def is_open(self):
+        """True when this process has an open connection."""
+        return self._conn is not None and self._conn_pid == os.getpid()
+
+    def close(self):
+        if self.is_open():
+            self._conn.close()
+        self._conn = None
+        self._conn_pid = None
@@ -7,6 +7,7 @@ import dlt
 import dagster as dg
 
 from wow_api_dlt.pipeline import wow_api_source  
+from wow_api_dlt.utilities.commodity_compaction import compact_commodities
 
 DB_PATH = (
     Path(__file__).resolve().parents[3] /
@@ -31,4 +32,5 @@ def raw_wow_assets(
 ):
     """Kör DLT-hämtningen när du själv triggar den."""
     yield from dlt.run(context=context)
+    compact_commodities(my_pipeline) # Fold old commodity snapshots into per-item aggregates
 
@@ -0,0 +1,7 @@
+import os
+
+# The fetch engine is created when wow_api_dlt.utilities.auth_util is imported and reads its credentials from
+# the dlt secrets. Tests never reach the real API, placeholders are enough when no secrets are configured.
+os.environ.setdefault("WOW_API__CLIENT_ID", "test-client-id")
+os.environ.setdefault("WOW_API__CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("RUNTIME__DLTHUB_TELEMETRY", "false")
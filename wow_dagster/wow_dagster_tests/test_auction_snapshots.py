@@ -0,0 +1,124 @@
+import json
+from concurrent.futures import Future
+
+import dlt
+import httpx
+import pytest
+
+from wow_api_dlt.resources import resources_auctions
+from wow_api_dlt.resources.resources_auctions import fetch_auction_house_items, fetch_auction_history, fetch_auction_snapshots, fetch_ah_commodities
+from wow_api_dlt.utilities import auth_util
+from wow_api_dlt.utilities.dead_letter import DeadLetterStore
+
+REALM_ID = "1084"
+AUCTIONS_PER_SNAPSHOT = 300
+
+
+class _FakeSnapshotStream:
+    """Streamed snapshot response whose body can drop halfway, like a connection reset during the download."""
+
+    def __init__(self, auctions, last_modified, fail_after_bytes=None):
+        self.status_code = 200
+        self.headers = {"Last-Modified": last_modified}
+        self._body = json.dumps({"auctions": auctions}).encode()
+        self._fail_after_bytes = fail_after_bytes
+
+    def raise_for_status(self):
+        return
+
+    def iter_bytes(self):
+        for start in range(0, len(self._body), 1024):
+            if self._fail_after_bytes is not None and start >= self._fail_after_bytes:
+                raise httpx.ReadError("connection reset")
+            yield self._body[start:start + 1024]
+
+    def close(self, wait=True):
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _snapshot(first_id, last_modified, fail_halfway=False):
+    auctions = [
+        {"id": first_id + i, "item": {"id": 19019}, "buyout": 1000 + i, "quantity": 1, "unit_price": 100 + i, "time_left": "LONG"}
+        for i in range(AUCTIONS_PER_SNAPSHOT)
+    ]
+    stream = _FakeSnapshotStream(auctions, last_modified)
+    if fail_halfway:
+        stream._fail_after_bytes = len(stream._body) // 2
+    future = Future()
+    future.set_result(stream)
+    return future
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    # Small batches, so a snapshot spans several of them like a big realm does
+    monkeypatch.setattr(resources_auctions, "ARROW_BATCH_ROWS", 100)
+    monkeypatch.setattr(resources_auctions, "fetch_realm_ids", lambda: (REALM_ID,))
+    monkeypatch.setattr(resources_auctions, "dead_letter_store", DeadLetterStore(tmp_path / "dead_letters.sqlite"))
+    return dlt.pipeline(
+        pipeline_name="test_auction_snapshots",
+        pipelines_dir=str(tmp_path / "pipelines"),
+        destination=dlt.destinations.duckdb(str(tmp_path / "wow_api.duckdb")),
+        dataset_name="raw_auctions",
+    )
+
+
+def _serve_realm_snapshot(monkeypatch, snapshot):
+    monkeypatch.setattr(auth_util, "iter_api_responses", lambda requests, **kwargs: [(r_id, snapshot) for r_id, *_ in requests])
+
+
+def _run_auctions(pipeline):
+    auctions = fetch_auction_house_items()
+    pipeline.run([auctions, auctions | fetch_auction_history, auctions | fetch_auction_snapshots])
+
+
+def _query(pipeline, sql):
+    with pipeline.sql_client() as client:
+        return client.execute_sql(sql)
+
+
+def test_failed_realm_download_keeps_the_previous_snapshot(pipeline, monkeypatch):
+    _serve_realm_snapshot(monkeypatch, _snapshot(1, "Mon, 06 Oct 2025 10:00:00 GMT"))
+    _run_auctions(pipeline)
+
+    _serve_realm_snapshot(monkeypatch, _snapshot(10_000, "Mon, 06 Oct 2025 11:00:00 GMT", fail_halfway=True))
+    _run_auctions(pipeline)
+
+    assert _query(pipeline, "SELECT count(*), min(id) FROM auctions") == [(AUCTIONS_PER_SNAPSHOT, 1)]
+    assert _query(pipeline, "SELECT count(*) FROM auction_history") == [(AUCTIONS_PER_SNAPSHOT,)]
+    assert _query(pipeline, "SELECT count(*) FROM auction_snapshots") == [(1,)]
+    assert list(resources_auctions.dead_letter_store.pending("auctions")) == [REALM_ID]
+
+
+def test_failed_commodities_download_loads_nothing(pipeline, monkeypatch):
+    snapshots = iter([
+        _snapshot(1, "Mon, 06 Oct 2025 10:00:00 GMT"),
+        _snapshot(10_000, "Mon, 06 Oct 2025 11:00:00 GMT", fail_halfway=True),
+    ])
+    monkeypatch.setattr(auth_util, "stream_api_request", lambda **kwargs: next(snapshots))
+    pipeline.run(fetch_ah_commodities())
+    pipeline.run(fetch_ah_commodities())
+
+    assert _query(pipeline, "SELECT count(*), count(DISTINCT timestamp), min(id) FROM commodities") == [(AUCTIONS_PER_SNAPSHOT, 1, 1)]
+
+
+def test_retry_pass_fetches_failed_realms_at_low_priority(pipeline, monkeypatch):
+    priorities = []
+
+    def iter_api_responses(requests, priority, **kwargs):
+        priorities.append(priority)
+        return [(r_id, _snapshot(1, "Mon, 06 Oct 2025 10:00:00 GMT")) for r_id, *_ in requests]
+
+    monkeypatch.setattr(auth_util, "iter_api_responses", iter_api_responses)
+    resources_auctions.dead_letter_store.record("auctions", REALM_ID, "/data/wow/connected-realm/1084/auctions", {}, "timeout")
+    pipeline.run(fetch_auction_house_items(retry_failed_only=True))
+    pipeline.run(fetch_auction_house_items())
+
+    assert priorities == [auth_util.PRIORITY_LOW, auth_util.PRIORITY_HIGH]
+    assert resources_auctions.dead_letter_store.pending("auctions") == {}
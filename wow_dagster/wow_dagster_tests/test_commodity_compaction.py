@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+
+import dlt
+import pytest
+
+from wow_api_dlt.utilities.commodity_compaction import compact_commodities, COMMODITY_AGGREGATES_TABLE
+
+NEWEST_SNAPSHOT = datetime(2025, 10, 6, 12, tzinfo=timezone.utc)
+OLD_SNAPSHOTS = [NEWEST_SNAPSHOT - timedelta(days=3), NEWEST_SNAPSHOT - timedelta(days=3, hours=-1)]
+RECENT_SNAPSHOTS = [NEWEST_SNAPSHOT - timedelta(days=1), NEWEST_SNAPSHOT]
+
+
+def _commodities(snapshot_time):
+    """Three auctions of item 2589 and one of item 2592 per snapshot."""
+    return [
+        {"id": 1, "item__id": 2589, "quantity": 10, "unit_price": 100, "time_left": "LONG", "timestamp": snapshot_time},
+        {"id": 2, "item__id": 2589, "quantity": 30, "unit_price": 200, "time_left": "LONG", "timestamp": snapshot_time},
+        {"id": 3, "item__id": 2589, "quantity": 60, "unit_price": 150, "time_left": "SHORT", "timestamp": snapshot_time},
+        {"id": 4, "item__id": 2592, "quantity": 5, "unit_price": 40, "time_left": "LONG", "timestamp": snapshot_time},
+    ]
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    pipeline = dlt.pipeline(
+        pipeline_name="test_commodity_compaction",
+        pipelines_dir=str(tmp_path / "pipelines"),
+        destination=dlt.destinations.duckdb(str(tmp_path / "wow_api.duckdb")),
+        dataset_name="raw_auctions",
+    )
+    rows = [row for snapshot_time in OLD_SNAPSHOTS + RECENT_SNAPSHOTS for row in _commodities(snapshot_time)]
+    pipeline.run(rows, table_name="commodities")
+    return pipeline
+
+
+def _query(pipeline, sql):
+    with pipeline.sql_client() as client:
+        return client.execute_sql(sql)
+
+
+def test_old_snapshots_are_folded_into_aggregates(pipeline):
+    assert compact_commodities(pipeline, retention=timedelta(days=2)) == len(OLD_SNAPSHOTS)
+
+    aggregates = _query(pipeline, f"""
+        SELECT timestamp, item__id, auction_count, quantity, min_unit_price, max_unit_price, avg_unit_price
+        FROM {COMMODITY_AGGREGATES_TABLE} ORDER BY timestamp, item__id""")
+    assert aggregates == [
+        row
+        for snapshot_time in OLD_SNAPSHOTS
+        for row in [
+            (snapshot_time, 2589, 3, 100, 100, 200, (10 * 100 + 30 * 200 + 60 * 150) / 100),
+            (snapshot_time, 2592, 1, 5, 40, 40, 40.0),
+        ]
+    ]
+
+
+def test_recent_snapshots_stay_untouched(pipeline):
+    compact_commodities(pipeline, retention=timedelta(days=2))
+
+    raw = _query(pipeline, "SELECT timestamp, id, item__id, quantity, unit_price, time_left FROM commodities ORDER BY timestamp, id")
+    assert raw == [
+        (row["timestamp"], row["id"], row["item__id"], row["quantity"], row["unit_price"], row["time_left"])
+        for snapshot_time in RECENT_SNAPSHOTS
+        for row in _commodities(snapshot_time)
+    ]
+
+
+def test_second_compaction_is_a_no_op(pipeline):
+    compact_commodities(pipeline, retention=timedelta(days=2))
+    raw = _query(pipeline, "SELECT * FROM commodities ORDER BY timestamp, id")
+    aggregates = _query(pipeline, f"SELECT * FROM {COMMODITY_AGGREGATES_TABLE} ORDER BY timestamp, item__id")
+
+    assert compact_commodities(pipeline, retention=timedelta(days=2)) == 0
+    assert _query(pipeline, "SELECT * FROM commodities ORDER BY timestamp, id") == raw
+    assert _query(pipeline, f"SELECT * FROM {COMMODITY_AGGREGATES_TABLE} ORDER BY timestamp, item__id") == aggregates
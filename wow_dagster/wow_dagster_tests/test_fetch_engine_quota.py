@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from wow_api_dlt import rate_limiter as rate_limiter_module
+from wow_api_dlt.rate_limiter import SlidingWindowRateLimiter, AdaptiveRateLimiter
+from wow_api_dlt.utilities.fetch_engine import BlizzardFetchEngine
+
+STUB_QUOTA = 40 # Requests per second the stub server accepts
+TOTAL_REQUESTS = 400
+
+
+@pytest.fixture
+def quota_stub_url():
+    """Local server that enforces a per-second quota and answers 429 + Retry-After when it is exceeded."""
+    served = deque()
+    served_lock = threading.Lock()
+
+    class QuotaStubHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self): # OAuth token endpoint
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self._send_json(200, {"access_token": "stub-token", "expires_in": 3600})
+
+        def do_GET(self):
+            now = time.monotonic()
+            with served_lock:
+                while served and served[0] <= now - 1.0:
+                    served.popleft()
+                allowed = len(served) < STUB_QUOTA
+                if allowed:
+                    served.append(now)
+            time.sleep(0.02) # Simulated network + server latency
+            if allowed:
+                self._send_json(200, {"path": self.path})
+            else:
+                self._send_json(429, {"error": "quota exceeded"}, headers={"Retry-After": "1"})
+
+    class QuotaStubServer(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 128 # The default backlog of 5 drops connections and adds 1s SYN retries
+
+    server = QuotaStubServer(("127.0.0.1", 0), QuotaStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def _run_against_stub(rate_limiter, base_url):
+    """Sends TOTAL_REQUESTS through a fresh engine, returns the number of 429s seen and of requests that failed after retries."""
+    rate_limited = 0
+    original_observe = rate_limiter.observe_response
+
+    def counting_observe(status_code, headers, latency_seconds):
+        nonlocal rate_limited
+        if status_code == 429:
+            rate_limited += 1
+        original_observe(status_code, headers, latency_seconds)
+
+    rate_limiter.observe_response = counting_observe
+    engine = BlizzardFetchEngine(base_url, "stub-id", "stub-secret", f"{base_url}/token", rate_limiter, max_in_flight=64, backoff_factor=0.25)
+    try:
+        responses = [future.result() for future in [engine.submit("/data/stub", {"i": i}) for i in range(TOTAL_REQUESTS)]]
+    finally:
+        engine.close()
+    failed = sum(1 for response in responses if response.status_code != 200)
+    return rate_limited, failed
+
+
+def test_adaptive_limiter_backs_off_to_the_server_quota(quota_stub_url, monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, "STATUS_REPORT_INTERVAL_SECONDS", float("inf"))
+
+    fixed_429, _ = _run_against_stub(SlidingWindowRateLimiter(per_second_limit=100, per_hour_limit=1_000_000), quota_stub_url)
+    adaptive = AdaptiveRateLimiter(per_second_limit=100, per_hour_limit=1_000_000, initial_rate_per_second=50)
+    adaptive_429, adaptive_failed = _run_against_stub(adaptive, quota_stub_url)
+
+    assert adaptive_failed == 0
+    assert adaptive_429 * 4 < fixed_429, f"adaptive limiter saw {adaptive_429} x 429, fixed limiter {fixed_429}"
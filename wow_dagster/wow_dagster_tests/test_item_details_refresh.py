@@ -0,0 +1,61 @@
+from wow_api_dlt import db
+from wow_api_dlt.resources.resources_items import _items_to_refresh
+
+
+def _create_raw_items(db_path, item_ids):
+    with db.DuckDBConnection(db_path) as db_handler:
+        db_handler.execute("CREATE SCHEMA raw_items")
+        db_handler.execute("""
+            CREATE TABLE raw_items.items AS
+            SELECT
+                range AS id, 'Item ' || range AS name__en_us, 10 AS level, 1 AS required_level, 'COMMON' AS quality__type,
+                0 AS item_class__id, 0 AS item_subclass__id, 'NON_EQUIP' AS inventory_type__type,
+                100 AS purchase_price, 25 AS sell_price, 1 AS purchase_quantity, 0 AS max_count,
+                FALSE AS is_equippable, TRUE AS is_stackable, range AS media__id
+            FROM range(1, ?)""", [max(item_ids) + 1])
+
+
+def _load_details(db_path):
+    """Stores details for every item under its current fingerprint, like a completed fetch_item_details run."""
+    with db.DuckDBConnection(db_path) as db_handler:
+        fetched = _items_to_refresh(db_handler)
+        db_handler.register_df("fetched", fetched)
+        db_handler.execute("CREATE TABLE raw_items.item_details AS SELECT id, fingerprint AS search_fingerprint FROM fetched")
+
+
+def _refresh(db_path):
+    with db.DuckDBConnection(db_path) as db_handler:
+        return _items_to_refresh(db_handler)
+
+
+def test_new_items_are_not_flagged_as_changed(tmp_path):
+    db_path = tmp_path / "items.duckdb"
+    _create_raw_items(db_path, range(1, 6))
+
+    refresh = _refresh(db_path)
+
+    assert refresh["id"].tolist() == [1, 2, 3, 4, 5]
+    assert not refresh["changed"].any()
+
+
+def test_name_price_and_media_changes_do_not_refetch_details(tmp_path):
+    db_path = tmp_path / "items.duckdb"
+    _create_raw_items(db_path, range(1, 6))
+    _load_details(db_path)
+    with db.DuckDBConnection(db_path) as db_handler:
+        db_handler.execute("UPDATE raw_items.items SET name__en_us = 'Renamed', purchase_price = 200, sell_price = 50, media__id = 99")
+
+    assert _refresh(db_path).empty
+
+
+def test_preview_changes_refetch_details_past_the_cache(tmp_path):
+    db_path = tmp_path / "items.duckdb"
+    _create_raw_items(db_path, range(1, 6))
+    _load_details(db_path)
+    with db.DuckDBConnection(db_path) as db_handler:
+        db_handler.execute("UPDATE raw_items.items SET level = 20 WHERE id IN (2, 4)")
+        db_handler.execute("INSERT INTO raw_items.items SELECT * REPLACE (6 AS id) FROM raw_items.items WHERE id = 1")
+
+    refresh = _refresh(db_path)
+
+    assert dict(zip(refresh["id"], refresh["changed"])) == {2: True, 4: True, 6: False}
@@ -0,0 +1,31 @@
+import time
+from collections import Counter
+
+from wow_api_dlt.rate_limiter import SQLiteQuotaStore
+
+
+def _stores(tmp_path, per_second_limit, per_hour_limit):
+    """Two stores on one file, like a Dagster run and a main.py run on the same host."""
+    db_path = tmp_path / "api_quota.sqlite"
+    return [SQLiteQuotaStore(db_path, per_second_limit, per_hour_limit) for _ in range(2)]
+
+
+def test_stores_share_the_per_second_limit(tmp_path):
+    stores = _stores(tmp_path, per_second_limit=5, per_hour_limit=1_000)
+    start = time.time()
+    slots = [stores[i % 2].reserve(not_before=start) for i in range(30)]
+
+    requests_per_second = Counter(int(slot) for slot in slots)
+    assert max(requests_per_second.values()) == 5
+    assert len(requests_per_second) == 6
+
+
+def test_stores_share_the_per_hour_limit(tmp_path):
+    stores = _stores(tmp_path, per_second_limit=100, per_hour_limit=25)
+    start = time.time()
+    slots = [stores[i % 2].reserve(not_before=start) for i in range(26)]
+
+    assert max(slots[:25]) < start + 1
+    # The 26th request waits until the minute of the first 25 has left the 61 minute window
+    assert slots[25] >= (int(start // 60) + 61) * 60
+    assert slots[25] - start > 3600 - 60